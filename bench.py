@@ -0,0 +1,308 @@
+import sys
+import os
+import argparse
+import json
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+# The benchmark never opens a window; it has to be set before Qt is imported.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QT_VERSION_STR, QModelIndex
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import QApplication
+
+import xynnote
+from xynstore import BlobStore, SqliteBackend
+
+OPERATIONS = ["load_notes", "search_notes", "search_short", "save_notes_to_file", "update_note_list",
+              "load_selected_note", "image_decode", "thumbnail_decode"]
+
+# ---------------------------
+# Synthetic Corpus
+# ---------------------------
+def make_words(rng, count):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "xy", "zen", "dor", "pha", "qui", "bel", "tro"]
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def make_text(rng, words, size):
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(words)
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)[:size]
+
+def make_image(rng, width, height):
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    # Scatter some noise so the encoded images are not trivially compressible.
+    for _ in range(16):
+        x, y = rng.randrange(width), rng.randrange(height)
+        for row in range(y, min(y + 4, height)):
+            for col in range(x, min(x + 64, width)):
+                image.setPixelColor(col, row, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return xynnote.encode_image(image, "png", -1, 0)
+
+# Writes notes.db and the blobs into data_dir; returns the vocabulary the notes were written from.
+def generate_corpus(data_dir, notes, content_size, images, image_pool, image_size, seed, batch=10000):
+    rng = random.Random(seed)
+    words = make_words(rng, 5000)
+    blobs = BlobStore(os.path.join(data_dir, "blobs"))
+    keys = [blobs.put(make_image(rng, image_size, image_size)) for _ in range(image_pool if images else 0)]
+    store = SqliteBackend(os.path.join(data_dir, "notes.db"), blobs)
+    try:
+        for start in range(0, notes, batch):
+            rows = []
+            for _ in range(start, min(start + batch, notes)):
+                title = " ".join(rng.choice(words) for _ in range(rng.randint(2, 6)))
+                refs = [rng.choice(keys) for _ in range(images)] if keys else []
+                rows.append((title, store.pack(make_text(rng, words, content_size)), json.dumps(refs)))
+            with store.conn:
+                store.conn.executemany("INSERT INTO notes (title, content, images) VALUES (?, ?, ?)", rows)
+    finally:
+        store.close()
+    return words
+
+# ---------------------------
+# Measurements
+# ---------------------------
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def bytes_written():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class Recorder:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.results = {}
+
+    # Runs fn once per iteration; fn returns the elapsed seconds or None to time the whole call.
+    def run(self, name, fn, iterations):
+        samples = []
+        written = bytes_written()
+        size = tree_size(self.data_dir)
+        for i in range(iterations):
+            start = time.perf_counter()
+            elapsed = fn(i)
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            samples.append(elapsed * 1000)
+        after = bytes_written()
+        self.results[name] = {
+            "iterations": iterations,
+            "mean_ms": sum(samples) / len(samples),
+            "p50_ms": percentile(samples, 0.50),
+            "p90_ms": percentile(samples, 0.90),
+            "p99_ms": percentile(samples, 0.99),
+            "max_ms": max(samples),
+            "peak_rss_bytes": peak_rss(),
+            "bytes_written": None if written is None or after is None else after - written,
+            "store_growth_bytes": tree_size(self.data_dir) - size,
+        }
+        print(f"{name:20} p50 {self.results[name]['p50_ms']:9.2f} ms  p99 {self.results[name]['p99_ms']:9.2f} ms",
+              file=sys.stderr)
+
+def pump_until(app, done, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("operation did not finish in time")
+        app.processEvents()
+        time.sleep(0.0005)
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+def run_benchmarks(app, args, data_dir, words):
+    rng = random.Random(args.seed + 1)
+    recorder = Recorder(data_dir)
+    ops = set(args.ops)
+
+    start = time.perf_counter()
+    window = xynnote.MainWindow()
+    recorder.results["startup"] = {"elapsed_ms": (time.perf_counter() - start) * 1000, "peak_rss_bytes": peak_rss()}
+    count = len(window.notes)
+
+    if "load_notes" in ops:
+        recorder.run("load_notes", lambda i: window.load_notes(), args.iterations)
+
+    def search(queries):
+        def run(i):
+            window.search_input.setText(queries[i % len(queries)])
+            start = time.perf_counter()
+            window.search_notes()
+            pump_until(app, lambda: window.search_task is None)
+            return time.perf_counter() - start
+        return run
+
+    if "search_notes" in ops:
+        recorder.run("search_notes", search([rng.choice(words) for _ in range(args.iterations)]), args.iterations)
+    if "search_short" in ops:
+        recorder.run("search_short", search([rng.choice(words)[:2] for _ in range(args.iterations)]), args.iterations)
+    window.search_input.setText("")
+    window.search_notes()
+
+    if "load_selected_note" in ops and count:
+        def select(i):
+            index = window.note_filter.index(rng.randrange(count))
+            start = time.perf_counter()
+            window.load_selected_note(index, QModelIndex())
+            return time.perf_counter() - start
+        recorder.run("load_selected_note", select, args.iterations)
+
+    if "update_note_list" in ops:
+        recorder.run("update_note_list", lambda i: window.update_note_list(list(window.notes)), args.iterations)
+
+    if "save_notes_to_file" in ops and count:
+        def save(i):
+            for _ in range(args.dirty):
+                note = window.notes[rng.randrange(len(window.notes))]
+                note.content = make_text(rng, words, args.content_size)
+                window.mark_dirty(note)
+                window.note_model.note_changed(note)
+            start = time.perf_counter()
+            window.save_notes_to_file(wait=True)
+            elapsed = time.perf_counter() - start
+            app.processEvents()
+            return elapsed
+        recorder.run("save_notes_to_file", save, args.iterations)
+
+    keys = sorted(name for name, _ in window.store.blobs.keys())
+    for name, thumbnail in (("image_decode", False), ("thumbnail_decode", True)):
+        if name not in ops or not keys:
+            continue
+        def decode(i, thumbnail=thumbnail):
+            key = keys[i % len(keys)]
+            if thumbnail:
+                # Decode from the blob each time rather than from the thumbnail saved last run.
+                try:
+                    os.remove(window.store.blobs.derived_path(key, "thumb.png"))
+                except OSError:
+                    pass
+            cache = xynnote.ImageCache(window.store.blobs, xynnote.IMAGE_CACHE_MB * 1024 * 1024)
+            done = []
+            start = time.perf_counter()
+            cache.request(xynnote.thumbnail_key(key) if thumbnail else key, done.append, done.append)
+            pump_until(app, lambda: done)
+            elapsed = time.perf_counter() - start
+            cache.pool.waitForDone()
+            cache.deleteLater()
+            return elapsed
+        recorder.run(name, decode, args.iterations)
+
+    window.persistence.wait()
+    window.store.close()
+    window.store = None
+    window.close()
+    return recorder.results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless xynNotes benchmarks; prints the results as JSON.")
+    parser.add_argument("--notes", type=int, default=1000, help="number of notes in the corpus")
+    parser.add_argument("--content-size", type=int, default=1000, help="characters per note")
+    parser.add_argument("--images", type=int, default=1, help="images per note")
+    parser.add_argument("--image-pool", type=int, default=20, help="distinct images the notes refer to")
+    parser.add_argument("--image-size", type=int, default=1600, help="side of the generated images in pixels")
+    parser.add_argument("--dirty", type=int, default=10, help="notes changed before each save")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ops", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--data-dir", help="reuse or keep the corpus here instead of a temporary directory")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="xynnotes-bench-")
+    os.makedirs(data_dir, exist_ok=True)
+    # Point the application at the corpus instead of the user's notes.
+    xynnote.DATA_DIR = data_dir
+    try:
+        start = time.perf_counter()
+        reused = os.path.exists(os.path.join(data_dir, "notes.db"))
+        if reused:
+            words = make_words(random.Random(args.seed), 5000)
+        else:
+            words = generate_corpus(data_dir, args.notes, args.content_size, args.images, args.image_pool,
+                                    args.image_size, args.seed)
+        corpus_seconds = time.perf_counter() - start
+        results = run_benchmarks(app, args, data_dir, words)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+        "corpus": {
+            "notes": args.notes,
+            "content_size": args.content_size,
+            "images": args.images,
+            "image_pool": args.image_pool,
+            "image_size": args.image_size,
+            "seed": args.seed,
+            "reused": reused,
+            "generate_seconds": corpus_seconds,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import sys
+import argparse
+import itertools
+import json
+import random
+import time
+
+import xynstore
+from xynstore import pack_text, train_dictionary, unpack_text
+
+CODECS = ["none", "zlib", "zlib+dict", "lzma", "zstd"]
+
+# ---------------------------
+# Corpus
+# ---------------------------
+# Notes from an existing notebook, or synthetic ones with a Zipf-like word distribution, which
+# is closer to real prose than uniformly random words.
+def load_texts(data_dir):
+    store = xynstore.NoteStore.open_dir(data_dir)
+    try:
+        return [record["content"] for record in store.load()]
+    finally:
+        store.close()
+
+def make_texts(rng, count, sizes):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "xy", "zen", "dor", "pha", "qui", "bel", "tro"]
+    words = sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(8000)})
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    texts = []
+    for _ in range(count):
+        size = rng.choice(sizes)
+        lines, length = [], 0
+        while length < size:
+            line = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(3, 14)))
+            lines.append(line.capitalize() + ".")
+            length += len(line) + 2
+        texts.append("\n".join(lines)[:size])
+    return texts
+
+# ---------------------------
+# Measurements
+# ---------------------------
+def measure(texts, codec, zdict):
+    name = codec.split("+")[0]
+    zdict = zdict if codec.endswith("+dict") else None
+    start = time.perf_counter()
+    packed = [pack_text(text, name, zdict) for text in texts]
+    pack_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for value in packed:
+        unpack_text(value, zdict)
+    unpack_s = time.perf_counter() - start
+    raw = sum(len(text.encode("utf-8")) for text in texts)
+    stored = sum(len(value.encode("utf-8")) if isinstance(value, str) else len(value) for value in packed)
+    return {
+        "stored_bytes": stored,
+        "ratio": round(raw / stored, 2) if stored else None,
+        "pack_us_per_note": round(pack_s / len(texts) * 1e6, 1),
+        "unpack_us_per_note": round(unpack_s / len(texts) * 1e6, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare how note content compresses at rest; prints JSON.")
+    parser.add_argument("--data-dir", help="measure the notes of this notebook instead of a synthetic corpus")
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 500, 1000, 2000, 20000],
+                        help="note sizes in characters the synthetic corpus is drawn from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.data_dir:
+        texts = load_texts(args.data_dir)
+    else:
+        texts = make_texts(random.Random(args.seed), args.notes, args.sizes)
+    if not texts:
+        sys.exit("No notes to measure")
+    zdict = train_dictionary(t for t in texts if len(t.encode("utf-8")) <= xynstore.DICTIONARY_MAX_BYTES)
+    results = {
+        "notes": len(texts),
+        "raw_bytes": sum(len(text.encode("utf-8")) for text in texts),
+        "dictionary_bytes": len(zdict),
+        "codecs": {},
+    }
+    for codec in CODECS:
+        if codec == "zstd" and xynstore._zstd is None:
+            continue
+        results["codecs"][codec] = measure(texts, codec, zdict)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from xynstore import NoteStore
+
+# Shared by the store tests: a tiny PNG blob, a store in a fresh data directory and note
+# bodies long enough to be compressed, plus two notes to export.
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+def open_store(tmp_path, name="data"):
+    return NoteStore.open_dir(str(tmp_path / name))
+
+def body(n):
+    return "".join(f"line {i} of note {n} with some ordinary words\n" for i in range(40))
+
+def fill(store):
+    image = store.blobs.put(PNG)
+    store.add("Alpha", "first note", [image])
+    store.add("Beta", "second note")
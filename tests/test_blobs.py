@@ -0,0 +1,22 @@
+import os
+
+from helpers import PNG, open_store
+
+# ---------------------------
+# Compaction and Garbage Collection
+# ---------------------------
+def test_compact_drops_tombstones_and_garbage_blobs(tmp_path):
+    store = open_store(tmp_path)
+    kept = store.blobs.put(PNG)
+    dropped = store.blobs.put(PNG + b"other")
+    keep = store.add("Keep", "keep", [kept])
+    gone = store.add("Gone", "gone", [dropped])
+    store.delete(gone.id)
+    store.compact()
+    store.prune_history(days=-1)
+    store.collect_garbage(set(), float("inf"))
+    assert store.tombstone_count() == 0
+    assert store.get(keep.id).images == [kept]
+    assert os.path.exists(store.blobs.path(kept))
+    assert not os.path.exists(store.blobs.path(dropped))
+    store.close()
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import xynstore
+from xynstore import pack_text, unpack_text
+
+from helpers import body, open_store
+
+# ---------------------------
+# Compression
+# ---------------------------
+@pytest.mark.parametrize("codec", ["zlib", "lzma", "none"])
+def test_pack_round_trip(codec):
+    text = body(1) * 3
+    packed = pack_text(text, codec)
+    assert unpack_text(packed) == text
+    assert isinstance(packed, str) == (codec == "none")
+
+def test_short_text_stays_plain():
+    assert pack_text("short", "zlib") == "short"
+
+def test_dictionary_round_trip():
+    texts = [body(n) for n in range(200)]
+    zdict = xynstore.train_dictionary(texts)
+    packed = pack_text(texts[0], "zlib", zdict)
+    assert packed[0] == 2
+    assert len(packed) < len(pack_text(texts[0], "zlib"))
+    assert unpack_text(packed, zdict) == texts[0]
+
+def test_dictionary_learned_by_another_instance(tmp_path):
+    a = open_store(tmp_path)
+    b = open_store(tmp_path)
+    with a.transaction():
+        for n in range(xynstore.DICTIONARY_MIN_NOTES):
+            a.add(f"n{n}", body(n))
+    a.build_dictionary()
+    assert a.zdict is not None and b.zdict is None
+    note = a.add("packed", body(999))
+    assert a.conn.execute("SELECT content FROM notes WHERE id = ?", (note.id,)).fetchone()[0][0] == 2
+    assert b.get(note.id).content == body(999)
+    # Saving from the other instance unpacks the replaced content to drop it from the search index.
+    b.update(note.id, content="rewritten")
+    assert a.get(note.id).content == "rewritten"
+    a.close()
+    b.close()
+
+# ---------------------------
+# Search Index
+# ---------------------------
+def test_plain_sql_writes_work_and_are_indexed_on_open(tmp_path):
+    store = open_store(tmp_path)
+    kept = store.add("Kept", body(1))
+    edited = store.add("Edited", body(2))
+    store.close()
+    conn = sqlite3.connect(str(tmp_path / "data" / "notes.db"))
+    with conn:
+        conn.execute("INSERT INTO notes (title, content, images) VALUES ('Raw', 'written by a script', '[]')")
+        conn.execute("UPDATE notes SET content = 'rewritten by a script' WHERE id = ?", (edited.id,))
+    conn.close()
+    store = open_store(tmp_path)
+    assert sorted(store.find("by a script")) == [edited.id, edited.id + 1]
+    assert store.find("note 2") == []
+    assert store.find("note 1") == [kept.id]
+    # Saving over a note written elsewhere meanwhile rebuilds the index rather than guessing what it held.
+    conn = sqlite3.connect(str(tmp_path / "data" / "notes.db"))
+    with conn:
+        conn.execute("UPDATE notes SET content = 'changed again by a script' WHERE id = ?", (kept.id,))
+    conn.close()
+    store.update(kept.id, content="saved again")
+    store.close()
+    store = open_store(tmp_path)
+    assert store.find("saved again") == [kept.id]
+    assert store.find("again by") == []
+    assert store.find("note 1") == []
+    store.close()
@@ -0,0 +1,30 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from xynstore import export_notes
+
+from helpers import fill, open_store
+
+# ---------------------------
+# Export
+# ---------------------------
+@pytest.mark.parametrize("target", ["out", "out.zip", "out.tar.gz"])
+def test_export(tmp_path, target):
+    store = open_store(tmp_path)
+    fill(store)
+    path = str(tmp_path / target)
+    ids = [note_id for note_id, _ in store.load_index()]
+    assert export_notes(store, ids, path, "txt", workers=2) == 2
+    if target.endswith(".zip"):
+        with zipfile.ZipFile(path) as z:
+            names = sorted(z.namelist())
+    elif target.endswith(".tar.gz"):
+        with tarfile.open(path) as t:
+            names = sorted(t.getnames())
+    else:
+        names = sorted(os.listdir(path))
+    assert names == ["1 - Alpha.1.png", "1 - Alpha.txt", "2 - Beta.txt"]
+    store.close()
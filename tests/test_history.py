@@ -0,0 +1,45 @@
+import xynstore
+
+from helpers import open_store
+
+# ---------------------------
+# Revision History
+# ---------------------------
+def test_history_round_trip_and_restore(tmp_path, monkeypatch):
+    monkeypatch.setattr(xynstore, "HISTORY_COALESCE_SECONDS", 0)
+    store = open_store(tmp_path)
+    lines = [f"line {i}\n" for i in range(200)]
+    note = store.add("v0", "".join(lines))
+    states = ["".join(lines)]
+    for n in range(1, 70):
+        lines[(n * 37) % len(lines)] = f"edited {n}\n"
+        if n % 5 == 0:
+            lines.insert(n, "inserted\n")
+        store.update(note.id, title=f"v{n}", content="".join(lines))
+        states.append("".join(lines))
+    history = store.history(note.id)
+    assert len(history) == len(states) - 1
+    for (revision_id, _, title), state, n in zip(reversed(history), states, range(len(states))):
+        record = store.revision(revision_id)
+        assert (record.title, record.content) == (f"v{n}", state)
+
+    oldest = history[-1][0]
+    store.delete(note.id)
+    store.compact()
+    assert store.get(note.id) is None
+    store.restore(oldest)
+    assert store.get(note.id).content == states[0]
+    # The deleted state was kept and can be restored in turn.
+    assert store.revision(store.history(note.id)[0][0]).content == states[-1]
+    store.close()
+
+def test_short_lived_states_are_coalesced(tmp_path):
+    store = open_store(tmp_path)
+    note = store.add("t", "v0\n" * 20)
+    store.update(note.id, content="v1\n" * 20)
+    store.update(note.id, content="v2\n" * 20)
+    store.update(note.id, content="v3\n" * 20)
+    history = store.history(note.id)
+    assert len(history) == 1
+    assert store.revision(history[0][0]).content == "v0\n" * 20
+    store.close()
@@ -0,0 +1,38 @@
+import time
+
+from xynstore import export_notes, import_tree
+
+from helpers import PNG, fill, open_store
+
+# ---------------------------
+# Import
+# ---------------------------
+def test_export_then_import_round_trip(tmp_path):
+    source = open_store(tmp_path, "source")
+    fill(source)
+    export_notes(source, [1, 2], str(tmp_path / "out"), "md", numbered=False)
+    source.close()
+    target = open_store(tmp_path, "target")
+    assert import_tree(target, str(tmp_path / "out"), workers=1) == 2
+    records = {title: target.get(note_id) for note_id, title in target.load_index()}
+    assert records["Alpha"].content == "first note"
+    assert target.blobs.get(records["Alpha"].images[0]) == PNG
+    assert records["Beta"].images == []
+    target.close()
+
+def test_imported_blobs_survive_collection_by_another_instance(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    for n in range(6):
+        (source / f"note{n}.txt").write_text(f"note {n}", encoding="utf-8")
+        (source / f"note{n}.png").write_bytes(PNG + bytes([n]))
+    a = open_store(tmp_path)
+    b = open_store(tmp_path)
+    # `b` collects everything unreferenced and unheld after each batch of `a`'s import.
+    progress = lambda imported: b.collect_garbage(set(), time.time() + 1)
+    assert import_tree(a, str(source), workers=1, batch_size=1, progress=progress) == 6
+    for note_id, _ in a.load_index():
+        assert a.blobs.get(a.get(note_id).images[0]).startswith(PNG)
+    assert a.conn.execute("SELECT COUNT(*) FROM pending_blobs").fetchone()[0] == 0
+    a.close()
+    b.close()
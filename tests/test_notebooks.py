@@ -0,0 +1,39 @@
+import json
+import sqlite3
+
+import xynstore
+from xynstore import DEFAULT_NOTEBOOK, NotebookCatalog
+
+# ---------------------------
+# Notebooks
+# ---------------------------
+def test_search_across_notebooks_reads_only_indexes(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    catalog = NotebookCatalog(str(data_dir))
+    store = catalog.open(DEFAULT_NOTEBOOK)
+    store.add("Default", "a shared word")
+    store.close()
+    store = catalog.open(catalog.create("Work"))
+    store.add("Plan", "the shared word too")
+    store.close()
+    # A notebook from before the search index and one that is still a legacy notes.json.
+    old = data_dir / "notebooks" / "Old"
+    old.mkdir()
+    conn = sqlite3.connect(str(old / "notes.db"))
+    conn.executescript(xynstore.MIGRATIONS[0])
+    conn.execute("INSERT INTO notes (title, content, images) VALUES ('Old', 'shared', '[]')")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+    legacy = data_dir / "notebooks" / "Legacy"
+    legacy.mkdir()
+    (legacy / "notes.json").write_text(json.dumps([{"title": "Legacy", "content": "shared"}]), encoding="utf-8")
+
+    names = [DEFAULT_NOTEBOOK, "Legacy", "Old", "Work"]
+    assert sorted(catalog.search("SHARED", names)) == [(DEFAULT_NOTEBOOK, 1, "Default"), ("Work", 1, "Plan")]
+    assert list(catalog.search("sh", names)) == []
+    assert not (legacy / "notes.db").exists() and (legacy / "notes.json").exists()
+    conn = sqlite3.connect(str(old / "notes.db"))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,94 @@
+import base64
+import json
+import sqlite3
+
+import xynstore
+from xynstore import NoteStore
+
+from helpers import PNG, body, open_store
+
+# ---------------------------
+# Saving and Tombstones
+# ---------------------------
+def test_save_assigns_ids_and_reloads(tmp_path):
+    store = open_store(tmp_path)
+    first = store.add("First", "alpha")
+    second = store.add("Second", "beta", [store.blobs.put(PNG)])
+    store.close()
+    store = open_store(tmp_path)
+    assert [title for _, title in store.load_index()] == ["First", "Second"]
+    assert store.get(first.id).content == "alpha"
+    assert store.blobs.get(store.get(second.id).images[0]) == PNG
+    store.close()
+
+def test_delete_leaves_a_tombstone(tmp_path):
+    store = open_store(tmp_path)
+    record = store.add("Gone", "soon")
+    store.delete(record.id)
+    assert store.get(record.id) is None
+    assert store.tombstone_count() == 1
+    assert store.load_index() == []
+    assert store.find("soon") == []
+    store.close()
+
+def test_transaction_writes_once_at_the_end(tmp_path):
+    store = open_store(tmp_path)
+    with store.transaction():
+        store.add("A", "a")
+        store.add("B", "b")
+        assert store.load_index() == []
+    assert len(store.load_index()) == 2
+    store.close()
+
+# ---------------------------
+# Schema Migrations and Legacy JSON
+# ---------------------------
+def test_migrates_first_schema_version(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    conn = sqlite3.connect(str(data_dir / "notes.db"))
+    conn.executescript(xynstore.MIGRATIONS[0])
+    conn.execute(
+        "INSERT INTO notes (title, content, images) VALUES (?, ?, ?)",
+        ("Old", body(0), json.dumps([base64.b64encode(PNG).decode()])),
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    store = NoteStore.open_dir(str(data_dir))
+    assert store.conn.execute("PRAGMA user_version").fetchone()[0] == len(xynstore.MIGRATIONS)
+    record = store.get(1)
+    assert record.content == body(0)
+    assert xynstore.is_blob_key(record.images[0]) and store.blobs.get(record.images[0]) == PNG
+    assert store.find("note 0") == [1]
+    assert isinstance(store.conn.execute("SELECT content FROM notes").fetchone()[0], bytes)
+    store.close()
+
+def test_legacy_json_is_imported_once(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    legacy = [
+        {"title": "One", "content": "first", "images": [base64.b64encode(PNG).decode()]},
+        {"title": "Two", "content": "second"},
+    ]
+    (data_dir / "notes.json").write_text(json.dumps(legacy), encoding="utf-8")
+    store = NoteStore.open_dir(str(data_dir))
+    assert [title for _, title in store.load_index()] == ["One", "Two"]
+    assert store.blobs.get(store.get(1).images[0]) == PNG
+    store.close()
+    assert not (data_dir / "notes.json").exists()
+    assert (data_dir / "notes.json.bak").exists()
+    store = NoteStore.open_dir(str(data_dir))
+    assert len(store.load_index()) == 2
+    store.close()
+
+def test_legacy_json_is_imported_after_an_interrupted_first_start(tmp_path):
+    data_dir = tmp_path / "data"
+    # The first start created the database but died before the migration committed.
+    open_store(tmp_path).close()
+    (data_dir / "notes.json").write_text(json.dumps([{"title": "One", "content": "first"}]), encoding="utf-8")
+    store = NoteStore.open_dir(str(data_dir))
+    assert [title for _, title in store.load_index()] == ["One"]
+    store.close()
+    assert (data_dir / "notes.json.bak").exists()
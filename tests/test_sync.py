@@ -0,0 +1,81 @@
+import time
+
+import xynstore
+from xynstore import NoteRecord
+
+from helpers import PNG, open_store
+
+# ---------------------------
+# Conflicts Between Writers
+# ---------------------------
+def test_stale_edit_is_saved_beside_the_newer_one(tmp_path):
+    a = open_store(tmp_path)
+    b = open_store(tmp_path)
+    note = a.add("Shared", "original")
+    base = b.change_seq()
+    b.update(note.id, content="theirs")
+    assert [row[0] for row in a.changes_since(base)] == [note.id]
+
+    mine = NoteRecord(None, note.id, "Shared", "mine", [], base=base)
+    a.save([mine], [])
+    assert mine.conflict and mine.id != note.id
+    assert a.get(note.id).content == "theirs"
+    assert a.get(mine.id).content == "mine"
+
+    stale_delete = NoteRecord(None, note.id, "", "", (), base=base)
+    a.save([], [stale_delete])
+    assert stale_delete.conflict
+    assert a.get(note.id) is not None
+
+    fresh = NoteRecord(None, note.id, "Shared", "updated", [], base=a.change_seq())
+    a.save([fresh], [])
+    assert not fresh.conflict and a.get(note.id).content == "updated"
+    a.close()
+    b.close()
+
+def test_deletions_are_seen_after_compaction(tmp_path):
+    a = open_store(tmp_path)
+    b = open_store(tmp_path)
+    with b.transaction():
+        records = [b.add(f"n{n}", "x") for n in range(xynstore.COMPACT_THRESHOLD + 10)]
+    ids = [record.id for record in records]
+    seq = a.change_seq()
+    with b.transaction():
+        for note_id in ids:
+            b.delete(note_id)
+    b.compact()
+    assert b.tombstone_count() == 0
+    changes = a.changes_since(seq)
+    assert sorted(row[0] for row in changes) == ids
+    assert all(row[2] == 1 for row in changes)
+    a.close()
+    b.close()
+
+# ---------------------------
+# Unsaved Images
+# ---------------------------
+def test_held_blobs_survive_collection_by_another_instance(tmp_path):
+    a = open_store(tmp_path)
+    b = open_store(tmp_path)
+    pasted = a.put_held_blob(PNG)
+    # Unsaved in `a` however long ago it was written; `b` collects everything older than now.
+    b.collect_garbage(set(), time.time() + 1)
+    assert b.blobs.get(pasted) == PNG
+    a.close()
+    b.collect_garbage(set(), time.time() + 1)
+    assert dict(b.blobs.keys()) == {}
+    b.close()
+
+def test_saving_releases_held_blobs_and_stale_holds_expire(tmp_path):
+    a = open_store(tmp_path)
+    saved = a.put_held_blob(PNG)
+    a.add("With image", "x", [saved])
+    assert a.conn.execute("SELECT COUNT(*) FROM pending_blobs").fetchone()[0] == 0
+    # A hold left behind by an instance that died without closing.
+    stale = a.put_held_blob(PNG + b"stale")
+    a.conn.execute("UPDATE pending_blobs SET updated = ?", (time.time() - xynstore.PENDING_BLOB_EXPIRY_SECONDS - 1,))
+    a.conn.commit()
+    a.collect_garbage(set(), time.time() + 1)
+    assert {key for key, _ in a.blobs.keys()} == {saved}
+    assert stale != saved
+    a.close()
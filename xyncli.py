@@ -0,0 +1,158 @@
+import sys
+import os
+import argparse
+import json
+import time
+
+from xynstore import SEARCH_INDEX_MIN_CHARS, NotebookCatalog, default_data_dir, export_notes, import_tree
+
+# ---------------------------
+# Commands
+# ---------------------------
+def cmd_search(store, args):
+    if args.all:
+        if len(args.query) < SEARCH_INDEX_MIN_CHARS:
+            sys.exit(f"Searching all notebooks needs at least {SEARCH_INDEX_MIN_CHARS} characters")
+        for notebook, note_id, title in args.catalog.search(args.query, limit=args.limit):
+            print(f"{notebook}\t{note_id}\t{title}")
+        return
+    for note_id in store.find(args.query, args.limit):
+        record = store.get(note_id)
+        if record is not None:
+            print(f"{note_id}\t{record.title}")
+
+def cmd_export(store, args):
+    if args.ids:
+        ids = args.ids
+    elif args.query:
+        ids = store.find(args.query)
+    else:
+        ids = [note_id for note_id, _ in store.load_index()]
+    start = time.perf_counter()
+    count = export_notes(store, ids, args.target, args.ext, args.workers)
+    print(f"Exported {count} notes to {args.target} in {time.perf_counter() - start:.2f} s")
+
+# .json files are read as legacy notebooks; other files and directory trees go through import_tree.
+def cmd_import(store, args):
+    count = 0
+    for path in args.paths:
+        if path.lower().endswith(".json"):
+            count += store.import_json(path)
+        else:
+            count += import_tree(store, path, args.workers, progress=lambda n: print(f"{count + n} notes", end="\r"))
+    print(f"Imported {count} notes")
+
+def cmd_history(store, args):
+    if args.revision is not None:
+        record = store.revision(args.revision)
+        if record is None:
+            sys.exit(f"No revision {args.revision}")
+        print(record.content)
+        return
+    if args.id is None:
+        sys.exit("Give a note id or --revision")
+    for revision_id, saved_over, title in store.history(args.id):
+        print(f"{revision_id}\t{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(saved_over))}\t{title}")
+
+def cmd_restore(store, args):
+    try:
+        record = store.restore(args.revision)
+    except KeyError:
+        sys.exit(f"No revision {args.revision}")
+    print(f"Restored note {record.id} to revision {args.revision}")
+
+# Lists the notebooks with the numbers cached when each was last used, or creates one.
+def cmd_notebooks(store, args):
+    if args.create:
+        print(f"Created notebook {args.catalog.create(args.create)}")
+        return
+    for name in args.catalog.names():
+        info = args.catalog.info.get(name)
+        marker = "*" if name == args.catalog.active else " "
+        if info is None:
+            print(f"{marker} {name}")
+        else:
+            modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(info["modified"]))
+            print(f"{marker} {name:24} {info['notes']:>8} notes {info['bytes']:>12} bytes  {modified}")
+
+def cmd_stats(store, args):
+    stats = store.stats()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        for name, value in stats.items():
+            print(f"{name:18} {value}")
+
+def cmd_compact(store, args):
+    before = store.stats()
+    store.compact()
+    store.prune_history()
+    # Images pasted in a running window and not saved yet are held in the database and kept.
+    store.collect_garbage(set(), time.time())
+    store.build_dictionary()
+    after = store.stats()
+    for name in ("tombstones", "revisions", "blobs", "blob_bytes", "database_bytes"):
+        print(f"{name:18} {before[name]} -> {after[name]}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="xyncli", description="Work on xynNotes notebooks without the GUI.")
+    parser.add_argument("--data-dir", default=None, help="data directory (default: the app's data directory)")
+    parser.add_argument("--notebook", default=None, help="notebook to work on (default: the one last opened)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="list notes containing a text")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=None, help="most results (per notebook with --all)")
+    search.add_argument("--all", action="store_true", help="search every notebook")
+    search.set_defaults(run=cmd_search)
+
+    export = commands.add_parser("export", help="write notes and their images to a directory or archive")
+    export.add_argument("target", help="directory, or a .zip, .tar or .tar.gz file")
+    export.add_argument("ids", nargs="*", type=int, help="note ids (default: every note)")
+    export.add_argument("--query", help="export the notes matching a search instead")
+    export.add_argument("--ext", default="txt")
+    export.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    export.set_defaults(run=cmd_export)
+
+    imp = commands.add_parser("import", help="add notes from text/markdown files, folders or notes.json exports")
+    imp.add_argument("paths", nargs="+")
+    imp.add_argument("--workers", type=int, default=None)
+    imp.set_defaults(run=cmd_import)
+
+    history = commands.add_parser("history", help="list the earlier versions of a note")
+    history.add_argument("id", type=int, nargs="?")
+    history.add_argument("--revision", type=int, help="print the text of this revision instead")
+    history.set_defaults(run=cmd_history)
+
+    restore = commands.add_parser("restore", help="bring a note back to an earlier version")
+    restore.add_argument("revision", type=int)
+    restore.set_defaults(run=cmd_restore)
+
+    notebooks = commands.add_parser("notebooks", help="list the notebooks")
+    notebooks.add_argument("--create", metavar="NAME", help="create an empty notebook instead")
+    notebooks.set_defaults(run=cmd_notebooks, opens_store=False)
+
+    stats = commands.add_parser("stats", help="show notebook size")
+    stats.add_argument("--json", action="store_true")
+    stats.set_defaults(run=cmd_stats)
+
+    compact = commands.add_parser("compact", help="drop deleted notes, expired revisions and unreferenced images")
+    compact.set_defaults(run=cmd_compact)
+
+    args = parser.parse_args(argv)
+    args.catalog = NotebookCatalog(args.data_dir or default_data_dir())
+    if not getattr(args, "opens_store", True) or args.command == "search" and args.all:
+        args.run(None, args)
+        return
+    notebook = args.notebook or args.catalog.active
+    if not args.catalog.exists(notebook):
+        sys.exit(f"No notebook named '{notebook}'")
+    store = args.catalog.open(notebook)
+    try:
+        args.run(store, args)
+        args.catalog.remember(notebook, store)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,57 @@
 import sys
-import json
 import os
-import shutil
-from appdirs import user_data_dir
-import base64
-from PyQt6.QtCore import Qt, QPoint, QEvent, QByteArray, QBuffer, QIODevice, QRectF
+# Imported first so startup phases are timed from here.
+from xyntrace import tracer, traced
+import itertools
+import hashlib
+import math
+import time
+from collections import OrderedDict
+import sqlite3
+import threading
+from PyQt6.QtCore import (
+    Qt, QPoint, QEvent, QBuffer, QIODevice, QRect, QRectF, QSize, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal,
+    QAbstractListModel, QModelIndex, QFileSystemWatcher
+)
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QSplitter,
-    QListWidget, QListWidgetItem, QTextEdit, QLineEdit, QLabel, QDialog, QMenu, QScrollArea,
-    QGraphicsView, QGraphicsScene
+    QListView, QPlainTextEdit, QLineEdit, QLabel, QDialog, QMenu, QScrollArea, QComboBox,
+    QGraphicsView, QGraphicsScene, QGraphicsObject, QGraphicsItem, QStyleOptionGraphicsItem
+)
+from PyQt6.QtGui import (
+    QKeySequence, QShortcut, QMouseEvent, QPixmap, QImage, QImageReader, QImageWriter, QImageIOHandler, QAction,
+    QPainter, QPen, QColor, QWheelEvent, QTextCursor
+)
+from xynstore import (
+    DEFAULT_NOTEBOOK, PENDING_BLOB_REFRESH_SECONDS, SEARCH_INDEX_MIN_CHARS, NotebookCatalog, NoteRecord,
+    default_data_dir, export_notes
 )
-from PyQt6.QtGui import QKeySequence, QShortcut, QMouseEvent, QPixmap, QAction, QPainter, QPen, QColor, QWheelEvent
+tracer.mark("imports")
 
 # Determine the user data directory for your application.
-DATA_DIR = user_data_dir("xynNotes", "xynLabs")
+# Each notebook there is a database with one record per note and a store of images kept once
+# per content hash; a legacy notes.json is migrated into the default notebook on first start.
+DATA_DIR = default_data_dir()
 os.makedirs(DATA_DIR, exist_ok=True)
-# The file where the notes will be stored.
-NOTES_PATH = os.path.join(DATA_DIR, "notes.json")
+# Seconds of editing collected into one background save; 0 turns autosave off.
+AUTOSAVE_SECONDS = float(os.environ.get("XYNNOTES_AUTOSAVE_SECONDS", "0"))
+# How pasted images are stored: format (png, jpg or webp), quality (0-100, -1 for the
+# format default) and the longest side in pixels they are scaled down to (0 keeps it).
+IMAGE_FORMAT = os.environ.get("XYNNOTES_IMAGE_FORMAT", "png").lower()
+IMAGE_QUALITY = int(os.environ.get("XYNNOTES_IMAGE_QUALITY", "-1"))
+IMAGE_MAX_SIZE = int(os.environ.get("XYNNOTES_IMAGE_MAX_SIZE", "0"))
+# Memory budget for decoded images, in MB.
+IMAGE_CACHE_MB = int(os.environ.get("XYNNOTES_IMAGE_CACHE_MB", "256"))
+# Memory budget for note bodies, in MB; the least recently used saved, unedited bodies beyond it
+# are dropped and read from the store again when accessed.
+NOTE_CACHE_MB = int(os.environ.get("XYNNOTES_NOTE_CACHE_MB", "64"))
+# Notes longer than this many characters open as a read-only preview that loads in chunks.
+LARGE_NOTE_CHARS = int(os.environ.get("XYNNOTES_LARGE_NOTE_CHARS", "1000000"))
+# How often, in ms, the open notebook is checked for notes saved by other windows or scripts.
+# File change notifications trigger a check sooner where the platform has them; 0 relies on those alone.
+WATCH_MS = int(os.environ.get("XYNNOTES_WATCH_MS", "1000"))
+# With tracing on (XYNNOTES_TRACE=1 or --trace), event loop gaps longer than this many ms count as stalls.
+STALL_MS = int(os.environ.get("XYNNOTES_TRACE_STALL_MS", "100"))
 
 # ---------------------------
 # Title Bar
@@ -40,6 +75,10 @@ class TitleBar(QWidget):
         
         layout.addStretch()
 
+        self.statusLabel = QLabel("")
+        self.statusLabel.setStyleSheet("padding: 0 10px; color: #aaa;")
+        layout.addWidget(self.statusLabel)
+
         self.minimizeButton = QLabel("_")
         self.minimizeButton.setFixedWidth(20)
         self.minimizeButton.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -54,6 +93,9 @@ class TitleBar(QWidget):
         layout.addWidget(self.closeButton)
         self.closeButton.mousePressEvent = self.closeClicked
 
+    def setStatus(self, text):
+        self.statusLabel.setText(text)
+
     def minimizeClicked(self, event):
         if self.parent:
             self.parent.showMinimized()
@@ -183,19 +225,49 @@ class CustomInfoDialog(QDialog):
         QShortcut(QKeySequence("Escape"), self, activated=self.reject)
 
 # ---------------------------
-# Export Dialog allows specifying the extension to be used
+# Name Dialog asks for a single name, e.g. of a new notebook
+# ---------------------------
+class NameDialog(QDialog):
+    def __init__(self, parent=None, title="Name", placeholder=""):
+        super().__init__(parent)
+        self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
+        self.setModal(True)
+        self.setFixedSize(400, 90)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.titleBar = PromptTitleBar(self, title=title)
+        main_layout.addWidget(self.titleBar)
+
+        content_widget = QWidget(self)
+        content_layout = QVBoxLayout(content_widget)
+        content_layout.setContentsMargins(10, 10, 10, 10)
+        self.line_edit = QLineEdit(self)
+        self.line_edit.setPlaceholderText(placeholder)
+        content_layout.addWidget(self.line_edit)
+        main_layout.addWidget(content_widget)
+
+        self.line_edit.returnPressed.connect(self.accept)
+        QShortcut(QKeySequence("Escape"), self, activated=self.reject)
+
+    def getName(self):
+        return self.line_edit.text().strip()
+
+# ---------------------------
+# Export Dialog allows specifying the extension and where to export to
 # ---------------------------
 class ExportDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, title="Export Note", destination=""):
         super().__init__(parent)
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.setModal(True)
-        self.setFixedSize(300, 100)
+        self.setFixedSize(400, 130)
         
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
         
-        self.titleBar = PromptTitleBar(self, title="Export Note")
+        self.titleBar = PromptTitleBar(self, title=title)
         main_layout.addWidget(self.titleBar)
         
         content_widget = QWidget(self)
@@ -204,20 +276,650 @@ class ExportDialog(QDialog):
         self.line_edit = QLineEdit(self)
         self.line_edit.setPlaceholderText("Enter file extension (e.g., lua, json, txt)")
         content_layout.addWidget(self.line_edit)
+        self.destination_edit = QLineEdit(destination, self)
+        self.destination_edit.setPlaceholderText("Folder, or a .zip, .tar or .tar.gz file")
+        content_layout.addWidget(self.destination_edit)
         main_layout.addWidget(content_widget)
         
         self.line_edit.returnPressed.connect(self.accept)
+        self.destination_edit.returnPressed.connect(self.accept)
     
     def getExtension(self):
         return self.line_edit.text().strip()
 
+    def getDestination(self):
+        return self.destination_edit.text().strip()
+
+# Session-unique keys; unlike store ids they exist before a note is first saved.
+_note_keys = itertools.count(1)
+
 class Note:
-    def __init__(self, title, content, images=None, deleted=False):
+    __slots__ = ("key", "id", "title", "_content", "_images", "_residency", "deleted", "base")
+
+    def __init__(self, title, content, images=None, deleted=False, id=None):
+        self.key = next(_note_keys)
+        self.id = id
         self.title = title
-        self.content = content
-        self.images = images if images is not None else []
+        self.base = None  # Store change sequence value this note was last read or saved at.
+        self._content = content
+        self._images = images if images is not None else []
+        self._residency = None
         self.deleted = deleted
 
+    # A note known only by its index entry; the body is read from the store on first access.
+    @classmethod
+    def from_index(cls, id, title, residency, base=None):
+        note = cls(sys.intern(title), None, id=id)
+        note._images = None
+        note._residency = residency
+        note.base = base
+        return note
+
+    @property
+    def loaded(self):
+        return self._content is not None
+
+    def _load_body(self):
+        self._residency.load_body(self)
+
+    # Drops the body of a saved note; it is read again on the next access.
+    def unload(self):
+        if self.id is not None:
+            self._content = None
+            self._images = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._load_body()
+        elif self._residency is not None:
+            self._residency.touch(self)
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        if self._content is None:
+            self._load_body()
+        self._content = value
+        if self._residency is not None:
+            self._residency.resized(self)
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._load_body()
+        return self._images
+
+    @images.setter
+    def images(self, value):
+        if self._images is None:
+            self._load_body()
+        self._images = value
+
+# Keeps the bodies of saved notes within a memory budget, dropping the least recently used ones
+# that is_pinned(note) allows (notes being edited or saved must stay).
+class NoteResidency:
+    def __init__(self, store, budget, is_pinned):
+        self.store = store
+        self.budget = budget
+        self.is_pinned = is_pinned
+        self.size = 0
+        self._notes = OrderedDict()  # note key -> (note, cost)
+
+    @staticmethod
+    def cost(note):
+        return sys.getsizeof(note._content) + 80 * len(note._images)
+
+    def load_body(self, note):
+        note._content, note._images = self.store.load_body(note.id)
+        self.resized(note)
+
+    def adopt(self, note):
+        note._residency = self
+        if note.loaded:
+            self.resized(note)
+
+    def touch(self, note):
+        if note.key in self._notes:
+            self._notes.move_to_end(note.key)
+
+    def resized(self, note):
+        self.forget(note)
+        cost = self.cost(note)
+        self._notes[note.key] = (note, cost)
+        self.size += cost
+        if self.size > self.budget:
+            self._evict(note)
+
+    def forget(self, note):
+        entry = self._notes.pop(note.key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        self._notes.clear()
+        self.size = 0
+
+    # Never drops `keep`, the note whose body is being accessed right now. Walks from the least
+    # recently used end only until enough is freed; the map cannot change while it is walked,
+    # so the victims are dropped afterwards.
+    def _evict(self, keep):
+        victims = []
+        for key, (note, cost) in self._notes.items():
+            if self.size <= self.budget:
+                break
+            if note is keep or note.id is None or self.is_pinned(note):
+                continue
+            victims.append((key, note))
+            self.size -= cost
+        for key, note in victims:
+            del self._notes[key]
+            note.unload()
+
+# ---------------------------
+# Decoded Image Cache
+# ---------------------------
+# Thumbnails fit in a square of this many pixels; the side panel never needs more.
+THUMBNAIL_SIZE = 512
+
+# A QImageReader over image data, with the buffer it reads from; the reader does not own the
+# buffer, so callers keep both. The reader tells the full size from the header alone, and formats
+# that support it (JPEG) decode a region or a scaled-down copy without the rest of the image.
+def image_reader(data):
+    buffer = QBuffer()
+    buffer.setData(data)
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    return QImageReader(buffer), buffer
+
+def blob_reader(blobs, key):
+    return image_reader(blobs.get(key))
+
+def read_image(reader):
+    image = reader.read()
+    if image.isNull():
+        return image, reader.errorString() or "Unsupported image"
+    return image, ""
+
+# Files derived from a blob are written under a temporary name so readers never see half a file.
+def save_derived(image, path):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        if image.save(tmp, "PNG"):
+            os.replace(tmp, path)
+    except OSError as e:
+        print("Error saving image:", e)
+
+# The decoders below return the image and, when it is null, why it could not be decoded.
+def decode_blob(blobs, key):
+    try:
+        reader, buffer = blob_reader(blobs, key)
+    except OSError as e:
+        return QImage(), str(e)
+    return read_image(reader)
+
+def load_thumbnail(blobs, key):
+    path = blobs.derived_path(key, "thumb.png")
+    image = QImage(path)
+    if not image.isNull():
+        return image, ""
+    try:
+        reader, buffer = blob_reader(blobs, key)
+    except OSError as e:
+        return QImage(), str(e)
+    size = reader.size()
+    if not size.isValid():
+        return QImage(), reader.errorString() or "Unsupported image"
+    if max(size.width(), size.height()) > THUMBNAIL_SIZE:
+        scaled = size.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio)
+        reader.setScaledSize(scaled.expandedTo(QSize(1, 1)))
+    image, error = read_image(reader)
+    if image.isNull():
+        return image, error
+    # Remember the full size so views can lay the thumbnail out at full-image scale.
+    image.setText("xyn-size", f"{size.width()}x{size.height()}")
+    save_derived(image, path)
+    return image, ""
+
+def thumbnail_key(key):
+    return "thumb:" + key
+
+# ---------------------------
+# Image Tiles
+# ---------------------------
+# Images with more pixels than this are shown zoomed in as tiles of a mip pyramid, stored as
+# files next to the blob, so only the visible tiles at the needed resolution are in memory.
+TILED_MIN_PIXELS = 4096 * 4096
+TILE_SIZE = 512
+
+# (width, height) of each pyramid level, full size first, halving until one tile covers it.
+def tile_levels(width, height):
+    levels = [(width, height)]
+    while max(width, height) > TILE_SIZE:
+        width, height = max((width + 1) // 2, 1), max((height + 1) // 2, 1)
+        levels.append((width, height))
+    return levels
+
+def tile_suffix(level, col, row):
+    return f"tile{level}-{col}-{row}.png"
+
+def tile_key(key, level, col, row):
+    return f"tile:{key}:{tile_suffix(level, col, row)}"
+
+def save_tiles(blobs, key, level, image):
+    width, height = image.width(), image.height()
+    for row in range(math.ceil(height / TILE_SIZE)):
+        for col in range(math.ceil(width / TILE_SIZE)):
+            x, y = col * TILE_SIZE, row * TILE_SIZE
+            tile = image.copy(x, y, min(TILE_SIZE, width - x), min(TILE_SIZE, height - y))
+            save_derived(tile, blobs.derived_path(key, tile_suffix(level, col, row)))
+
+# Marks that the full-size tiles of a blob exist; the other levels are made from them.
+def mark_tiled(blobs, key):
+    with open(blobs.derived_path(key, "tiles"), "wb"):
+        pass
+
+# Cuts every level from an image that is decoded anyway, halving it level by level, and keeps
+# the last level, which fits in a thumbnail, as the thumbnail.
+def cut_pyramid(blobs, key, image):
+    width, height = image.width(), image.height()
+    for level, size in enumerate(tile_levels(width, height)):
+        if level:
+            image = image.scaled(
+                size[0], size[1], Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation
+            )
+        save_tiles(blobs, key, level, image)
+    image.setText("xyn-size", f"{width}x{height}")
+    save_derived(image, blobs.derived_path(key, "thumb.png"))
+    mark_tiled(blobs, key)
+
+# Cuts the full-size tiles of a stored image once. Formats that decode a region (JPEG) are read
+# a row of tiles at a time; the others (PNG) have to be decoded whole, within Qt's allocation
+# limit, and are cut into every level at once. Returns an error message, or "".
+def cut_base(blobs, key):
+    try:
+        data = blobs.get(key)
+    except OSError as e:
+        return str(e)
+    reader, buffer = image_reader(data)
+    full = reader.size()
+    if not full.isValid():
+        return reader.errorString() or "Unsupported image"
+    if not reader.supportsOption(QImageIOHandler.ImageOption.ClipRect):
+        image, error = read_image(reader)
+        if not image.isNull():
+            cut_pyramid(blobs, key, image)
+        return error
+    for row in range(math.ceil(full.height() / TILE_SIZE)):
+        reader, buffer = image_reader(data)
+        y = row * TILE_SIZE
+        reader.setClipRect(QRect(0, y, full.width(), min(TILE_SIZE, full.height() - y)))
+        strip, error = read_image(reader)
+        if strip.isNull():
+            return error
+        for col in range(math.ceil(full.width() / TILE_SIZE)):
+            x = col * TILE_SIZE
+            tile = strip.copy(x, 0, min(TILE_SIZE, full.width() - x), strip.height())
+            save_derived(tile, blobs.derived_path(key, tile_suffix(0, col, row)))
+    mark_tiled(blobs, key)
+    return ""
+
+# Reads a tile, making it the first time it is shown. Full-size tiles are cut from the blob
+# once; a tile of any other level is the four tiles of the level below it halved, so no more
+# than a few tiles are ever decoded at once.
+def load_tile(blobs, key, level, col, row):
+    path = blobs.derived_path(key, tile_suffix(level, col, row))
+    image = QImage(path)
+    if not image.isNull():
+        return image, ""
+    if not os.path.exists(blobs.derived_path(key, "tiles")):
+        error = cut_base(blobs, key)
+        if error:
+            return QImage(), error
+        image = QImage(path)
+        if not image.isNull():
+            return image, ""
+    if level == 0:
+        return QImage(), "Missing image tile"
+    below = QImage(2 * TILE_SIZE, 2 * TILE_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+    below.fill(Qt.GlobalColor.transparent)
+    width = height = 0
+    painter = QPainter(below)
+    try:
+        for dy in (0, 1):
+            for dx in (0, 1):
+                tile, error = load_tile(blobs, key, level - 1, 2 * col + dx, 2 * row + dy)
+                if tile.isNull():
+                    if dx or dy:
+                        # Past the right or bottom edge of the level below.
+                        continue
+                    return tile, error
+                painter.drawImage(dx * TILE_SIZE, dy * TILE_SIZE, tile)
+                width = max(width, dx * TILE_SIZE + tile.width())
+                height = max(height, dy * TILE_SIZE + tile.height())
+    finally:
+        painter.end()
+    image = below.copy(0, 0, width, height).scaled(
+        (width + 1) // 2, (height + 1) // 2,
+        Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation,
+    )
+    save_derived(image, path)
+    return image, ""
+
+# Draws an image of the given full size from its tiles, choosing the pyramid level from the
+# view's zoom. Missing tiles are requested from the cache and drawn when they arrive; until then
+# whatever lies below (the thumbnail) shows through. A tile that cannot be decoded is not asked
+# for again; on_error(message) reports the first such failure.
+class TiledImageItem(QGraphicsObject):
+    def __init__(self, cache, key, size, on_error=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.key = key
+        self.levels = tile_levels(size.width(), size.height())
+        self.size = size
+        self.on_error = on_error
+        self.requested = set()
+        self.failed = False
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.size.width(), self.size.height())
+
+    def level_for(self, painter):
+        detail = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if detail <= 0 or detail >= 1:
+            return 0
+        return min(int(math.log2(1 / detail)), len(self.levels) - 1)
+
+    def paint(self, painter, option, widget=None):
+        level = self.level_for(painter)
+        width, height = self.levels[level]
+        # Scene units per level pixel, per axis (levels round odd sizes up).
+        sx, sy = self.size.width() / width, self.size.height() / height
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        first_col, last_col = int(exposed.left() / (TILE_SIZE * sx)), int(exposed.right() / (TILE_SIZE * sx))
+        first_row, last_row = int(exposed.top() / (TILE_SIZE * sy)), int(exposed.bottom() / (TILE_SIZE * sy))
+        last_col = min(last_col, math.ceil(width / TILE_SIZE) - 1)
+        last_row = min(last_row, math.ceil(height / TILE_SIZE) - 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                key = tile_key(self.key, level, col, row)
+                pixmap = self.cache.get(key)
+                if pixmap is None:
+                    if key not in self.requested:
+                        self.requested.add(key)
+                        self.cache.request(
+                            key, lambda pixmap, key=key: self._tile_arrived(key), self._tile_failed
+                        )
+                    continue
+                target = QRectF(
+                    col * TILE_SIZE * sx, row * TILE_SIZE * sy, pixmap.width() * sx, pixmap.height() * sy
+                )
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def _tile_arrived(self, key):
+        # Evicted tiles may be requested again.
+        self.requested.discard(key)
+        self.update()
+
+    def _tile_failed(self, message):
+        if not self.failed:
+            self.failed = True
+            if self.on_error is not None:
+                self.on_error(message)
+
+class DecodeTask(QRunnable):
+    def __init__(self, cache, key):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+
+    @traced("image_decode")
+    def run(self):
+        # QImage is safe to decode off the GUI thread; the QPixmap is made on arrival.
+        if self.key.startswith("thumb:"):
+            image, error = load_thumbnail(self.cache.blobs, self.key[len("thumb:"):])
+        elif self.key.startswith("tile:"):
+            _, key, suffix = self.key.split(":")
+            level, col, row = (int(n) for n in suffix[len("tile"):-len(".png")].split("-"))
+            image, error = load_tile(self.cache.blobs, key, level, col, row)
+        else:
+            image, error = decode_blob(self.cache.blobs, self.key)
+        self.cache.decoded.emit(self.key, image, error)
+
+# Pixmaps and thumbnails by blob key, shared by the main window and the viewers,
+# evicted least recently used first. Decoding always happens on the pool.
+class ImageCache(QObject):
+    decoded = pyqtSignal(str, QImage, str)
+
+    def __init__(self, blobs, budget, parent=None):
+        super().__init__(parent)
+        self.blobs = blobs
+        self.budget = budget
+        self.size = 0
+        self._pixmaps = OrderedDict()
+        self._full_sizes = {}  # blob key -> QSize of the full image
+        self._waiting = {}  # cache key -> (callback, failed) pairs
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        # Decoding a tile may cut its whole level; that must not hold up thumbnails. One thread
+        # also means the tiles of a level queued behind the one cutting it are then file reads.
+        self.tile_pool = QThreadPool(self)
+        self.tile_pool.setMaxThreadCount(1)
+        self.decoded.connect(self._on_decoded)
+
+    @staticmethod
+    def cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def full_size(self, key):
+        return self._full_sizes.get(key)
+
+    # The resident pixmap, without starting a decode.
+    def get(self, cache_key):
+        pixmap = self._pixmaps.get(cache_key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(cache_key)
+        return pixmap
+
+    # Calls callback(pixmap) with the cached pixmap, right away if it is resident, or
+    # failed(message) if the image cannot be decoded.
+    def request(self, cache_key, callback=None, failed=None):
+        pixmap = self._pixmaps.get(cache_key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(cache_key)
+            if callback is not None:
+                callback(pixmap)
+            return
+        callbacks = self._waiting.get(cache_key)
+        if callbacks is None:
+            callbacks = self._waiting[cache_key] = []
+            pool = self.tile_pool if cache_key.startswith("tile:") else self.pool
+            pool.start(DecodeTask(self, cache_key))
+        if callback is not None or failed is not None:
+            callbacks.append((callback, failed))
+
+    def put(self, cache_key, pixmap):
+        if cache_key in self._pixmaps:
+            self.size -= self.cost(self._pixmaps.pop(cache_key))
+        self._pixmaps[cache_key] = pixmap
+        self.size += self.cost(pixmap)
+        while self.size > self.budget and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self.size -= self.cost(evicted)
+
+    def prefetch(self, keys):
+        for key in keys:
+            self.request(thumbnail_key(key))
+
+    def _on_decoded(self, cache_key, image, error):
+        callbacks = self._waiting.pop(cache_key, [])
+        if image.isNull():
+            print(f"Error decoding image {cache_key}: {error}")
+            for _, failed in callbacks:
+                if failed is not None:
+                    try:
+                        failed(error)
+                    except RuntimeError:
+                        pass
+            return
+        if cache_key.startswith("thumb:"):
+            size = image.text("xyn-size")
+            if size:
+                width, height = size.split("x")
+                self._full_sizes[cache_key[len("thumb:"):]] = QSize(int(width), int(height))
+        elif not cache_key.startswith("tile:"):
+            self._full_sizes[cache_key] = image.size()
+        pixmap = QPixmap.fromImage(image)
+        self.put(cache_key, pixmap)
+        for callback, _ in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                # The requesting view was closed meanwhile.
+                pass
+
+# ---------------------------
+# Clipboard Image Ingest
+# ---------------------------
+def pixel_hash(image):
+    image = image.convertToFormat(QImage.Format.Format_ARGB32)
+    digest = hashlib.sha256(f"{image.width()}x{image.height()}".encode())
+    digest.update(image.constBits().asstring(image.sizeInBytes()))
+    return digest.hexdigest()
+
+def fit_image(image, max_size):
+    if max_size > 0 and max(image.width(), image.height()) > max_size:
+        image = image.scaled(
+            max_size, max_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
+        )
+    return image
+
+def encode_image(image, fmt, quality, max_size):
+    image = fit_image(image, max_size)
+    if fmt not in ("png", "jpg", "jpeg", "webp") or fmt.encode() not in [
+        bytes(f) for f in QImageWriter.supportedImageFormats()
+    ]:
+        fmt = "png"
+    if fmt in ("jpg", "jpeg"):
+        # JPEG has no alpha channel; flatten onto white instead of black.
+        flat = QImage(image.size(), QImage.Format.Format_RGB32)
+        flat.fill(QColor("white"))
+        painter = QPainter(flat)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        image = flat
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, fmt.upper(), quality)
+    return buffer.data().data()
+
+class IngestTask(QRunnable):
+    def __init__(self, store, note_key, image, done):
+        super().__init__()
+        self.store = store
+        self.note_key = note_key
+        self.image = image
+        self.done = done  # signal taking the note key and the blob key ("" on failure)
+
+    @traced("image_encode")
+    def run(self):
+        try:
+            # Re-pasting the same pixels reuses the stored blob without encoding again. Either way
+            # the store holds it for this window until a save references it.
+            digest = pixel_hash(self.image)
+            key = self.store.blob_for_pixels(digest)
+            if key is None:
+                image = fit_image(self.image, IMAGE_MAX_SIZE)
+                key = self.store.put_held_blob(encode_image(image, IMAGE_FORMAT, IMAGE_QUALITY, 0))
+                self.store.remember_pixels(digest, key)
+                if image.width() * image.height() > TILED_MIN_PIXELS:
+                    # The pixels are at hand now; views of the image never need to decode it whole.
+                    cut_pyramid(self.store.blobs, key, image)
+        except Exception as e:
+            print("Error storing image:", e)
+            key = ""
+        self.done.emit(self.note_key, key)
+
+# Renews the store's holds on images pasted here and not saved yet, so other windows and
+# scripts collecting garbage keep them for as long as this window runs.
+class RefreshHeldBlobsTask(QRunnable):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def run(self):
+        try:
+            self.store.refresh_held_blobs()
+        except sqlite3.Error as e:
+            print("Error refreshing held images:", e)
+
+# ---------------------------
+# Chunked Plain-Text Loading
+# ---------------------------
+# Characters appended to a text view per event loop turn.
+TEXT_CHUNK_CHARS = 256 * 1024
+
+# Appends text to a QPlainTextEdit a chunk at a time so huge notes never block the event loop.
+class ChunkedTextLoader(QObject):
+    finished = pyqtSignal()
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.text = ""
+        self.offset = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._load_chunk)
+
+    @property
+    def loading(self):
+        return self.timer.isActive()
+
+    def load(self, text):
+        self.stop()
+        self.view.setPlainText("")
+        self.text = text
+        self.offset = 0
+        self.timer.start(0)
+
+    def stop(self):
+        self.timer.stop()
+        self.text = ""
+
+    def _load_chunk(self):
+        end = min(self.offset + TEXT_CHUNK_CHARS, len(self.text))
+        if end < len(self.text):
+            # Break at a line end so lines are laid out once, whole.
+            newline = self.text.rfind("\n", self.offset, end)
+            if newline > self.offset:
+                end = newline + 1
+        document = self.view.document()
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(self.text[self.offset:end])
+        document.setModified(False)
+        self.offset = end
+        if self.offset >= len(self.text):
+            self.stop()
+            self.finished.emit()
+
+# Shows content in view; large content goes through loader, read-only. Returns True if it did.
+def show_plain_text(view, loader, content):
+    loader.stop()
+    large = len(content) > LARGE_NOTE_CHARS
+    # Undo history for a multi-megabyte insert is never used and costs as much as the text.
+    view.setUndoRedoEnabled(not large)
+    if large:
+        loader.load(content)
+    else:
+        view.setPlainText(content)
+    return large
+
 # ---------------------------
 # Note Viewer (Read-Only)
 # ---------------------------
@@ -231,6 +933,10 @@ class ZoomableImageView(QGraphicsView):
         self._pixmap_item = None
         self._original_pixmap = None
         self._zoom = 1.0
+        self._cache = None
+        self._key = None  # Blob shown; None for pasted previews.
+        self._tiles_item = None
+        self._full_resolution = False
         self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
         self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
@@ -239,16 +945,98 @@ class ZoomableImageView(QGraphicsView):
         self.viewport().setStyleSheet("")
 
     def clearImage(self):
+        self._key = None
+        self._pixmap_item = None
+        self._tiles_item = None
+        self._original_pixmap = None
         self._scene.clear()
 
+    @traced("setImage")
     def setImage(self, pixmap):
+        self._key = None
+        self._full_resolution = True
         self._original_pixmap = pixmap
+        self._tiles_item = None
         self._scene.clear()
         self._pixmap_item = self._scene.addPixmap(pixmap)
         self._scene.setSceneRect(QRectF(pixmap.rect()))
         self.fitInView(self._scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
         self._zoom = 1.0
 
+    # Shows a stored image from its thumbnail; the full-size decode waits until it is needed.
+    def showBlob(self, cache, key):
+        self.clearImage()
+        self._cache = cache
+        self._key = key
+        self._full_resolution = False
+        cache.request(
+            thumbnail_key(key), lambda pixmap: self._show_decoded(key, pixmap, fit=True),
+            lambda message: self._show_error(key, message),
+        )
+
+    def loadFullResolution(self):
+        if self._key is not None and not self._full_resolution:
+            key = self._key
+            if self._cache.full_size(key) is None:
+                # The thumbnail tells how large the image is; decide once it is in.
+                self._cache.request(
+                    thumbnail_key(key), lambda pixmap: self._load_full_resolution(key),
+                    lambda message: self._show_error(key, message),
+                )
+            else:
+                self._load_full_resolution(key)
+
+    def _load_full_resolution(self, key):
+        if key != self._key or self._full_resolution:
+            return
+        self._full_resolution = True
+        size = self._cache.full_size(key)
+        if size is not None and size.width() * size.height() > TILED_MIN_PIXELS:
+            # Tiles are decoded as they come into view; nothing is decoded up front.
+            self._show_tiles(key, size)
+        else:
+            self._cache.request(
+                key, lambda pixmap: self._show_decoded(key, pixmap, fit=False),
+                lambda message: self._show_error(key, message),
+            )
+
+    def _show_tiles(self, key, size):
+        if key != self._key or self._tiles_item is not None:
+            return
+        # Drawn over the thumbnail, which stays as the backdrop for tiles still loading.
+        self._tiles_item = TiledImageItem(self._cache, key, size, lambda message: self._show_error(key, message))
+        self._tiles_item.setZValue(1)
+        self._scene.addItem(self._tiles_item)
+
+    def _show_decoded(self, key, pixmap, fit):
+        if key != self._key or self._tiles_item is not None:
+            return
+        if self._pixmap_item is not None and self._pixmap_item.pixmap().width() >= pixmap.width():
+            # The full-size pixmap already arrived before this thumbnail.
+            return
+        full_size = self._cache.full_size(key) or pixmap.size()
+        self._original_pixmap = pixmap
+        self._scene.clear()
+        self._pixmap_item = self._scene.addPixmap(pixmap)
+        self._pixmap_item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        if pixmap.width():
+            # Thumbnails are laid out at full-image scale so swapping in the original keeps the view.
+            self._pixmap_item.setScale(full_size.width() / pixmap.width())
+        self._scene.setSceneRect(QRectF(0, 0, full_size.width(), full_size.height()))
+        if fit:
+            self.fitInView(self._scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+            self._zoom = 1.0
+
+    # Says in the view why the image (or part of it) could not be shown, over whatever did load.
+    def _show_error(self, key, message):
+        if key != self._key:
+            return
+        text = self._scene.addText(f"Cannot show image: {message}")
+        text.setDefaultTextColor(QColor("#ff6b6b"))
+        text.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIgnoresTransformations)
+        text.setPos(self._scene.sceneRect().topLeft())
+        text.setZValue(2)
+
     def wheelEvent(self, event):
         zoom_in_factor = 1.25
         zoom_out_factor = 1 / zoom_in_factor
@@ -258,6 +1046,8 @@ class ZoomableImageView(QGraphicsView):
             zoom_factor = zoom_out_factor
         self._zoom *= zoom_factor
         self.scale(zoom_factor, zoom_factor)
+        if zoom_factor > 1:
+            self.loadFullResolution()
 
     def keyPressEvent(self, event):
         if event.matches(QKeySequence.StandardKey.Paste):
@@ -266,18 +1056,15 @@ class ZoomableImageView(QGraphicsView):
         else:
             super().keyPressEvent(event)
 
+    @traced("pasteImage")
     def pasteImage(self):
         clipboard = QApplication.clipboard()
         image = clipboard.image()
         if not image.isNull():
-            pixmap = QPixmap.fromImage(image)
-            buffer = QBuffer()
-            buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-            pixmap.save(buffer, "PNG")
-            base64_str = buffer.data().toBase64().data().decode()
+            # Preview straight from the clipboard; encoding and storing happen in the background.
+            self.setImage(QPixmap.fromImage(image))
             if self.main_window and hasattr(self.main_window, "addImageToCurrentNote"):
-                self.main_window.addImageToCurrentNote(base64_str)
-            self.setImage(pixmap)
+                self.main_window.addImageToCurrentNote(image)
 
     def focusInEvent(self, event):
         super().focusInEvent(event)
@@ -299,8 +1086,12 @@ class ZoomableImageView(QGraphicsView):
             rect = self.rect().adjusted(0, 0, -1, -1)
             painter.drawRect(rect)
 
+# Viewers are reused through MainWindow's pool: show_note fills one in, closing releases the
+# note's text and pixmaps and emits closed.
 class NoteViewer(QMainWindow):
-    def __init__(self, note):
+    closed = pyqtSignal(object)
+
+    def __init__(self, image_cache):
         super().__init__()
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.resize(1024, 768)
@@ -310,28 +1101,47 @@ class NoteViewer(QMainWindow):
         main_layout.setContentsMargins(5, 5, 5, 5)
         self.setCentralWidget(main_widget)
         
-        self.titleBar = TitleBar(self, title=note.title)
+        self.image_cache = image_cache
+        self.note_key = None
+        self.titleBar = TitleBar(self, title="")
         main_layout.addWidget(self.titleBar)
         
         content_layout = QHBoxLayout()
         main_layout.addLayout(content_layout)
         
         # Read-only text
-        self.textEdit = QTextEdit()
-        self.textEdit.setPlainText(note.content)
+        self.textEdit = QPlainTextEdit()
         self.textEdit.setReadOnly(True)
-        self.textEdit.setStyleSheet("QTextEdit::viewport { padding: 5px; }")
+        self.textEdit.setStyleSheet("QPlainTextEdit::viewport { padding: 5px; }")
+        self.textLoader = ChunkedTextLoader(self.textEdit, self)
         content_layout.addWidget(self.textEdit, 1)
         
         self.imageViewer = ZoomableImageView(show_border=False)
-        if note.images:
-            ba = QByteArray.fromBase64(note.images[0].encode())
-            pixmap = QPixmap()
-            pixmap.loadFromData(ba)
-            self.imageViewer.setImage(pixmap)
         content_layout.addWidget(self.imageViewer, 1)
         
         QShortcut(QKeySequence("Ctrl+W"), self, activated=self.close)
+
+    def show_note(self, note):
+        self.note_key = note.key
+        self.titleBar.titleLabel.setText(note.title)
+        show_plain_text(self.textEdit, self.textLoader, note.content)
+        self.imageViewer.clearImage()
+        if note.images:
+            # Decoded through the main window's cache, so images it has shown are not decoded again.
+            self.imageViewer.showBlob(self.image_cache, note.images[0])
+            self.imageViewer.loadFullResolution()
+
+    def release(self):
+        self.note_key = None
+        self.textLoader.stop()
+        self.textEdit.clear()
+        self.imageViewer.clearImage()
+
+    def closeEvent(self, event):
+        super().closeEvent(event)
+        if event.isAccepted():
+            self.release()
+            self.closed.emit(self)
     
     def showEvent(self, event):
         # Center the window on the primary screen.
@@ -340,27 +1150,590 @@ class NoteViewer(QMainWindow):
         self.move(screen_geom.center() - self.rect().center())
         super().showEvent(event)
 
+# ---------------------------
+# Note List Model
+# ---------------------------
+class NoteListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.notes = []
+        self._rows = {}  # note key -> row; None while it needs rebuilding
+        self._ids = {}  # store id -> note key
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.notes)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        note = self.notes[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return note.title
+        if role == Qt.ItemDataRole.UserRole:
+            return note.key
+        return None
+
+    def _reindex(self):
+        self._rows = {note.key: row for row, note in enumerate(self.notes)}
+        self._ids = {note.id: note.key for note in self.notes if note.id is not None}
+
+    def set_notes(self, notes):
+        self.beginResetModel()
+        self.notes = notes
+        self._reindex()
+        self.endResetModel()
+
+    def row_of(self, key):
+        if self._rows is None:
+            self._reindex()
+        return self._rows.get(key, -1)
+
+    def note(self, key):
+        row = self.row_of(key)
+        return self.notes[row] if row >= 0 else None
+
+    def key_of_id(self, note_id):
+        if self._rows is None:
+            self._reindex()
+        return self._ids.get(note_id)
+
+    def append(self, note):
+        self.extend([note])
+
+    def extend(self, notes):
+        if not notes:
+            return
+        first = len(self.notes)
+        self.beginInsertRows(QModelIndex(), first, first + len(notes) - 1)
+        self.notes.extend(notes)
+        if self._rows is not None:
+            for row, note in enumerate(notes, start=first):
+                self._rows[note.key] = row
+                if note.id is not None:
+                    self._ids[note.id] = note.key
+        self.endInsertRows()
+
+    def note_changed(self, note):
+        row = self.row_of(note.key)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    # Newly saved notes now have store ids.
+    def notes_saved(self, notes):
+        for note in notes:
+            self._ids[note.id] = note.key
+
+    # The note with this id was saved under a new one.
+    def forget_id(self, note_id):
+        self._ids.pop(note_id, None)
+
+    def remove(self, notes):
+        rows = sorted((row for row in (self.row_of(note.key) for note in notes) if row >= 0), reverse=True)
+        i = 0
+        while i < len(rows):
+            # Remove contiguous runs of rows, last run first.
+            last = first = rows[i]
+            i += 1
+            while i < len(rows) and rows[i] == first - 1:
+                first = rows[i]
+                i += 1
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for note in self.notes[first:last + 1]:
+                self._ids.pop(note.id, None)
+            del self.notes[first:last + 1]
+            self._rows = None
+            self.endRemoveRows()
+
+# Lists either every note or a ranked subset, and styles notes flagged for deletion.
+class NoteFilterProxy(QAbstractListModel):
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.keys = None  # None lists every note; otherwise matching note keys in rank order
+        self._positions = {}
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self._source_reset)
+        source.rowsAboutToBeInserted.connect(self._source_rows_about_to_be_inserted)
+        source.rowsInserted.connect(self._source_rows_inserted)
+        source.rowsAboutToBeRemoved.connect(self._source_rows_about_to_be_removed)
+        source.rowsRemoved.connect(self._source_rows_removed)
+        source.dataChanged.connect(self._source_data_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.source.notes) if self.keys is None else len(self.keys)
+
+    def note_at(self, row):
+        if self.keys is None:
+            return self.source.notes[row]
+        return self.source.note(self.keys[row])
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        note = self.note_at(index.row())
+        if note is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return note.title
+        if role == Qt.ItemDataRole.UserRole:
+            return note.key
+        # If the note is flagged as deleted, show it in red.
+        if role == Qt.ItemDataRole.ForegroundRole and note.deleted:
+            return QColor("red")
+        return None
+
+    def index_of(self, key):
+        if self.keys is None:
+            row = self.source.row_of(key)
+        else:
+            row = self._positions.get(key, -1)
+        return self.index(row) if row >= 0 else QModelIndex()
+
+    def set_filter(self, keys):
+        self.beginResetModel()
+        self.keys = None if keys is None else list(keys)
+        self._positions = {key: row for row, key in enumerate(self.keys or ())}
+        self.endResetModel()
+
+    def add_matches(self, keys):
+        keys = [key for key in keys if key not in self._positions and self.source.row_of(key) >= 0]
+        if self.keys is None or not keys:
+            return
+        first = len(self.keys)
+        self.beginInsertRows(QModelIndex(), first, first + len(keys) - 1)
+        for row, key in enumerate(keys, start=first):
+            self._positions[key] = row
+        self.keys.extend(keys)
+        self.endInsertRows()
+
+    def _source_reset(self):
+        self.keys = None
+        self._positions = {}
+        self.endResetModel()
+
+    def _source_rows_about_to_be_inserted(self, parent, first, last):
+        if self.keys is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _source_rows_inserted(self, parent, first, last):
+        if self.keys is None:
+            self.endInsertRows()
+        else:
+            # Notes created while filtering stay visible.
+            self.add_matches([self.source.notes[row].key for row in range(first, last + 1)])
+
+    def _source_rows_about_to_be_removed(self, parent, first, last):
+        if self.keys is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+        rows = sorted(
+            (self._positions[note.key] for note in self.source.notes[first:last + 1] if note.key in self._positions),
+            reverse=True,
+        )
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.keys[row]
+            self._positions = {key: i for i, key in enumerate(self.keys)}
+            self.endRemoveRows()
+
+    def _source_rows_removed(self, parent, first, last):
+        if self.keys is None:
+            self.endRemoveRows()
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            index = self.index_of(self.source.notes[row].key)
+            if index.isValid():
+                self.dataChanged.emit(index, index)
+
+# ---------------------------
+# Background Search
+# ---------------------------
+# Typing pauses this long before a search is started.
+SEARCH_DEBOUNCE_MS = 150
+# Results are handed to the note list in batches of this size.
+SEARCH_BATCH_SIZE = 200
+# Matches counted per other notebook; more are shown as "1000+".
+NOTEBOOK_SEARCH_LIMIT = 1000
+
+class SearchSignals(QObject):
+    # generation, saved note ids, keys of matching unsaved notes
+    batch = pyqtSignal(int, list, list)
+    finished = pyqtSignal(int)
+
+class SearchTask(QRunnable):
+    def __init__(self, store, generation, query, dirty):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.store = store
+        self.generation = generation
+        self.query = query
+        self.dirty = dirty  # (key, id, title, content) of unsaved notes
+        self.signals = SearchSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @traced("search_query")
+    def run(self):
+        conn = self.store.connection()
+        # Lets SQLite abandon a stale query mid-scan.
+        conn.set_progress_handler(self.cancelled.is_set, 1000)
+        try:
+            dirty_ids = {note_id for _, note_id, _, _ in self.dirty}
+            cursor = self.store.search_cursor(self.query, conn)
+            while not self.cancelled.is_set():
+                rows = cursor.fetchmany(SEARCH_BATCH_SIZE)
+                if not rows:
+                    break
+                ids = [row[0] for row in rows if row[0] not in dirty_ids]
+                self.signals.batch.emit(self.generation, ids, [])
+            if not self.cancelled.is_set():
+                keys = [
+                    key for key, _, title, content in self.dirty
+                    if self.query in title.lower() or self.query in content.lower()
+                ]
+                self.signals.batch.emit(self.generation, [], keys)
+                self.signals.finished.emit(self.generation)
+        except sqlite3.OperationalError as e:
+            if not self.cancelled.is_set():
+                print("Error searching notes:", e)
+        finally:
+            conn.set_progress_handler(None, 0)
+
+class NotebookSearchSignals(QObject):
+    # generation, {notebook name: number of matches}
+    finished = pyqtSignal(int, dict)
+
+# Counts matches in the notebooks that are not open, one at a time through their indexes.
+class NotebookSearchTask(QRunnable):
+    def __init__(self, catalog, names, generation, query):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.catalog = catalog
+        self.names = names
+        self.generation = generation
+        self.query = query
+        self.signals = NotebookSearchSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @traced("search_notebooks")
+    def run(self):
+        counts = {}
+        try:
+            for notebook, _, _ in self.catalog.search(self.query, self.names, NOTEBOOK_SEARCH_LIMIT, self.cancelled):
+                counts[notebook] = counts.get(notebook, 0) + 1
+        except sqlite3.Error as e:
+            print("Error searching notebooks:", e)
+        if not self.cancelled.is_set():
+            self.signals.finished.emit(self.generation, counts)
+
+# ---------------------------
+# Write-Behind Persistence
+# ---------------------------
+class SaveTask(QRunnable):
+    def __init__(self, service, store, changed, deleted, since):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.service = service
+        self.store = store
+        self.changed = changed  # NoteRecords to write
+        self.deleted = deleted  # NoteRecords to turn into tombstones
+        self.since = since
+        self.keys = {record.key for record in changed + deleted}
+        self.error = ""
+
+    @traced("save_write")
+    def run(self):
+        pending_images = [key for record in self.changed for key in record.images]
+        try:
+            self.store.save(self.changed, self.deleted, pending_images, self.since)
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        self.service.finished.emit(self)
+
+# Writes snapshots of the dirty notes on a background thread, one save at a time.
+# Saves requested while one is running are coalesced into the next.
+class PersistenceService(QObject):
+    finished = pyqtSignal(object)
+    saved = pyqtSignal(object)
+
+    def __init__(self, window, interval_ms):
+        super().__init__(window)
+        self.window = window
+        self.interval_ms = interval_ms
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(max(interval_ms, 0))
+        self.timer.timeout.connect(self.flush)
+        self.in_flight = None
+        self.flush_again = False
+        self.finished.connect(self._on_finished)
+
+    # Called on every edit; with autosave on, the edits of one interval go out in one write.
+    def schedule(self):
+        if self.interval_ms > 0 and not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if self.in_flight is not None:
+            self.flush_again = True
+            return
+        task = self.window.snapshot_dirty_notes(self)
+        if task is not None:
+            self.in_flight = task
+            self.pool.start(task)
+
+    # Saves everything on the calling thread, e.g. before quitting; True if nothing is left unsaved.
+    def flush_and_wait(self):
+        self.timer.stop()
+        self.wait()
+        self.flush_again = False
+        task = self.window.snapshot_dirty_notes(self)
+        if task is not None:
+            self.in_flight = task
+            task.run()
+        return not self.window.unsaved_changes
+
+    def wait(self):
+        self.pool.waitForDone()
+        if self.in_flight is not None:
+            self._on_finished(self.in_flight)
+
+    def is_saving(self, key):
+        return self.in_flight is not None and key in self.in_flight.keys
+
+    def _on_finished(self, task):
+        if task is not self.in_flight:
+            return
+        self.in_flight = None
+        self.saved.emit(task)
+        if self.flush_again:
+            self.flush_again = False
+            self.flush()
+
+# ---------------------------
+# Background Export
+# ---------------------------
+class ExportSignals(QObject):
+    progress = pyqtSignal(int, int)
+    # notes exported, target, error ("" on success)
+    finished = pyqtSignal(int, str, str)
+
+class ExportTask(QRunnable):
+    def __init__(self, store, notes, target, ext, numbered):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.store = store
+        self.notes = notes  # store ids, or NoteRecords of notes with unsaved changes
+        self.target = target
+        self.ext = ext
+        self.numbered = numbered
+        self.signals = ExportSignals()
+        self.cancelled = threading.Event()
+
+    def _progress(self, done, total):
+        # About a hundred updates per export are enough for the title bar.
+        if done == total or done % max(total // 100, 1) == 0:
+            self.signals.progress.emit(done, total)
+
+    @traced("export_notes")
+    def run(self):
+        done, error = 0, ""
+        try:
+            done = export_notes(
+                self.store, self.notes, self.target, self.ext, workers=os.cpu_count() or 4,
+                progress=self._progress, cancelled=self.cancelled.is_set, numbered=self.numbered,
+            )
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        self.signals.finished.emit(done, self.target, error)
+
+# ---------------------------
+# External Change Detection
+# ---------------------------
+# Tells when another connection, in this process or another, committed to the store. File change
+# notifications (inotify on Linux) on the database and its WAL prompt a check; a timer polls as
+# a fallback. A check only compares SQLite's data_version, so it costs nothing when idle.
+class StoreWatcher(QObject):
+    changed = pyqtSignal()
+
+    def __init__(self, interval_ms, parent=None):
+        super().__init__(parent)
+        self.store = None
+        self.version = None
+        self.files = QFileSystemWatcher(self)
+        self.files.fileChanged.connect(self.schedule)
+        self.files.directoryChanged.connect(self._directory_changed)
+        # Collapses the notifications of one commit into one check.
+        self.pending = QTimer(self)
+        self.pending.setSingleShot(True)
+        self.pending.setInterval(50)
+        self.pending.timeout.connect(self.check)
+        self.poll = QTimer(self)
+        self.poll.setInterval(max(interval_ms, 0))
+        self.poll.timeout.connect(self.check)
+        self.interval_ms = interval_ms
+
+    def watch(self, store):
+        self.stop()
+        self.store = store
+        self.version = self._data_version()
+        self.files.addPath(os.path.dirname(os.path.abspath(store.path)))
+        self._watch_files()
+        if self.interval_ms > 0:
+            self.poll.start()
+
+    def stop(self):
+        self.poll.stop()
+        self.pending.stop()
+        paths = self.files.files() + self.files.directories()
+        if paths:
+            self.files.removePaths(paths)
+        self.store = None
+
+    def schedule(self, *args):
+        if self.store is not None and not self.pending.isActive():
+            self.pending.start()
+
+    # The WAL comes and goes with checkpoints; follow it when it is created again.
+    def _directory_changed(self, path):
+        self._watch_files()
+        self.schedule()
+
+    def _watch_files(self):
+        watched = set(self.files.files())
+        for path in (self.store.path, self.store.path + "-wal"):
+            if path not in watched and os.path.exists(path):
+                self.files.addPath(path)
+
+    def _data_version(self):
+        return self.store.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def check(self):
+        if self.store is None:
+            return
+        try:
+            version = self._data_version()
+        except sqlite3.Error as e:
+            print("Error checking for changes:", e)
+            return
+        if version != self.version:
+            self.version = version
+            self.changed.emit()
+
+# ---------------------------
+# Event Loop Stall Detection
+# ---------------------------
+# Ticks on the GUI thread; a tick arriving late means the event loop was blocked meanwhile.
+class StallWatchdog(QObject):
+    def __init__(self, interval_ms=20, parent=None):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._tick)
+        self.last_tick = None
+
+    def start(self):
+        self.last_tick = time.perf_counter()
+        self.timer.start()
+
+    def _tick(self):
+        now = time.perf_counter()
+        late_ms = (now - self.last_tick) * 1000 - self.interval_ms
+        self.last_tick = now
+        if late_ms > STALL_MS:
+            tracer.record_stall(late_ms, tracer.last_operation())
+
 # ---------------------------
 # Main Application Window
 # ---------------------------
+# When streaming the notes in at startup, this many are added to the list per event loop turn.
+INDEX_BATCH_SIZE = 2000
+# Closed note viewers kept hidden for reuse.
+VIEWER_POOL_SIZE = 2
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    image_ingested = pyqtSignal(int, str)
+
+    # With stream_notes set, the window shows before the notes are read and the list fills in batches.
+    def __init__(self, stream_notes=False):
         super().__init__()
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.setMinimumSize(800, 600)
         
-        self.notes = []
-        self.current_note_index = None
-        self.unsaved_changes = False  # Tracks unsaved changes.
-        self.viewers = []
+        self.note_model = NoteListModel(self)
+        self.note_filter = NoteFilterProxy(self.note_model, self)
+        # Only the active notebook is open; the others stay on disk until switched to.
+        self.catalog = NotebookCatalog(DATA_DIR)
+        self.notebook = self.catalog.active
+        self.store = None
+        self.image_cache = None
+        self.residency = None
+        self.current_note = None
+        self.dirty_keys = set()  # Keys of notes edited, created or deleted since the last save.
+        self.ingest_pool = QThreadPool(self)
+        self.ingest_pool.setMaxThreadCount(1)
+        self.hold_timer = QTimer(self)
+        self.hold_timer.timeout.connect(self.refresh_held_blobs)
+        self.hold_timer.start(PENDING_BLOB_REFRESH_SECONDS * 1000)
+        self.persistence = PersistenceService(self, int(AUTOSAVE_SECONDS * 1000))
+        self.persistence.saved.connect(self.on_notes_saved)
+        self.image_ingested.connect(self.on_image_ingested)
+        self.loading_editor = False
+        self.viewers = {}  # note key -> open NoteViewer
+        self.viewer_pool = []  # closed viewers kept for reuse
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_task = None
+        self.search_generation = 0
+        self.search_shown = 0  # Generation whose results are currently listed.
+        self.notebook_search_pool = QThreadPool(self)
+        self.notebook_search_pool.setMaxThreadCount(1)
+        self.notebook_search = None
+        self.synced_seq = 0  # Changes up to this store change sequence value are reflected in the list.
+        self.watcher = StoreWatcher(WATCH_MS, self)
+        self.watcher.changed.connect(self.merge_external_changes)
+        self.index_batches = None  # Remaining index batches while streaming notes in.
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.load_index_batch)
+        self.export_pool = QThreadPool(self)
+        self.export_pool.setMaxThreadCount(1)
+        self.export_tasks = []
         self.init_ui()
+        if stream_notes:
+            QTimer.singleShot(0, self.stream_notes)
+        else:
+            self.load_notes()
+            tracer.mark("interactive")
+
+    @property
+    def notes(self):
+        return self.note_model.notes
+
+    @property
+    def unsaved_changes(self):
+        return bool(self.dirty_keys)
 
     def showEvent(self, event):
-        self.imageViewer.setFixedWidth(self.note_list_widget.width())
+        self.imageViewer.setFixedWidth(self.note_list_view.width())
         super().showEvent(event)
+        tracer.mark("shown")
 
     def resizeEvent(self, event):
-        self.imageViewer.setFixedWidth(self.note_list_widget.width())
+        self.imageViewer.setFixedWidth(self.note_list_view.width())
         super().resizeEvent(event)
   
     def init_ui(self):
@@ -369,7 +1742,7 @@ class MainWindow(QMainWindow):
         main_layout.setContentsMargins(0, 0, 0, 0)
         self.setCentralWidget(main_widget)
         
-        self.titleBar = TitleBar(self, title="xynNotes")
+        self.titleBar = TitleBar(self, title=self.window_title())
         main_layout.addWidget(self.titleBar)
         
         content_widget = QWidget()
@@ -379,22 +1752,32 @@ class MainWindow(QMainWindow):
         
         # Left column: Note List
         left_column = QVBoxLayout()
+        self.notebook_box = QComboBox()
+        self.notebook_box.activated.connect(self.on_notebook_chosen)
+        self.refresh_notebook_box()
+        left_column.addWidget(self.notebook_box)
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search...")
-        self.search_input.textChanged.connect(self.search_notes)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_notes)
+        self.search_input.textChanged.connect(self.search_timer.start)
         left_column.addWidget(self.search_input)
         
-        self.note_list_widget = QListWidget()
-        self.note_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.note_list_widget.customContextMenuRequested.connect(self.on_note_list_context_menu)
-        self.note_list_widget.setStyleSheet("""
-            QListWidget:focus { border: 1px solid orange; }
-            QListWidget::viewport { padding: 5px; }
+        self.note_list_view = QListView()
+        self.note_list_view.setModel(self.note_filter)
+        self.note_list_view.setUniformItemSizes(True)
+        self.note_list_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.note_list_view.customContextMenuRequested.connect(self.on_note_list_context_menu)
+        self.note_list_view.setStyleSheet("""
+            QListView:focus { border: 1px solid orange; }
+            QListView::viewport { padding: 5px; }
         """)
-        self.note_list_widget.clicked.connect(self.load_selected_note)
-        self.note_list_widget.currentItemChanged.connect(self.load_selected_note)
-        self.note_list_widget.itemActivated.connect(self.open_viewer)
-        left_column.addWidget(self.note_list_widget)
+        self.note_list_view.clicked.connect(self.load_selected_note)
+        self.note_list_view.selectionModel().currentChanged.connect(self.load_selected_note)
+        self.note_list_view.activated.connect(self.open_viewer)
+        left_column.addWidget(self.note_list_view)
         content_layout.addLayout(left_column, 1)
         
         # Right column: Image List
@@ -404,15 +1787,17 @@ class MainWindow(QMainWindow):
         right_column.addWidget(self.note_title)
 
         editor_layout = QHBoxLayout()
-        self.note_content = QTextEdit()
+        self.note_content = QPlainTextEdit()
         self.note_content.setStyleSheet("""
-            QTextEdit:focus { border: 1px solid orange; }
-            QTextEdit::viewport { padding: 5px; }
+            QPlainTextEdit:focus { border: 1px solid orange; }
+            QPlainTextEdit::viewport { padding: 5px; }
         """)
         editor_layout.addWidget(self.note_content, stretch=3)
+        self.content_loader = ChunkedTextLoader(self.note_content, self)
+        self.editor_preview = False  # The editor shows a large note read-only; only its title can change.
 
         self.imageViewer = ZoomableImageView(self) # show_border defaults to True
-        self.imageViewer.setFixedWidth(self.note_list_widget.width())
+        self.imageViewer.setFixedWidth(self.note_list_view.width())
         editor_layout.addWidget(self.imageViewer, stretch=0)
 
         right_column.addLayout(editor_layout)
@@ -425,15 +1810,17 @@ class MainWindow(QMainWindow):
         QShortcut(QKeySequence("Ctrl+F"), self, activated=lambda: self.search_input.setFocus())
         QShortcut(QKeySequence("Ctrl+Up"), self, activated=self.navigate_up)
         QShortcut(QKeySequence("Ctrl+Down"), self, activated=self.navigate_down)
-        QShortcut(QKeySequence("Ctrl+C"), self.note_list_widget, activated=self.open_context_menu_for_current_item)
+        QShortcut(QKeySequence("Ctrl+C"), self.note_list_view, activated=self.open_context_menu_for_current_item)
+        if tracer.enabled:
+            QShortcut(QKeySequence("Ctrl+Shift+T"), self, activated=self.dump_trace)
         
         self.note_title.installEventFilter(self)
         self.note_content.installEventFilter(self)
-        
-        self.load_notes()
+        self.note_title.textEdited.connect(self.on_editor_modified)
+        self.note_content.document().modificationChanged.connect(self.on_editor_modified)
     
         def resizeEvent(self, event):
-            self.imagesTab.setFixedWidth(self.note_list_widget.width())
+            self.imagesTab.setFixedWidth(self.note_list_view.width())
             super().resizeEvent(event)
 
     
@@ -447,267 +1834,702 @@ class MainWindow(QMainWindow):
                 return True
         return super().eventFilter(source, event)
     
+    def mark_dirty(self, note):
+        self.dirty_keys.add(note.key)
+        self.persistence.schedule()
+
+    def add_note(self, note):
+        self.note_model.append(note)
+        self.mark_dirty(note)
+
+    def on_editor_modified(self, *args):
+        if self.loading_editor:
+            return
+        if self.current_note is not None and self.editor_modified():
+            self.mark_dirty(self.current_note)
+
+    def editor_modified(self):
+        if self.editor_preview:
+            return self.note_title.isModified()
+        return self.note_content.document().isModified() or self.note_title.isModified()
+
+    # The content in the editor; in preview mode the editor may hold only part of it.
+    def editor_content(self):
+        if self.editor_preview:
+            return self.current_note.content
+        return self.note_content.toPlainText().strip()
+
+    # The editor holds a fresh copy of the current note again.
+    def reset_editor_modified(self):
+        self.note_content.document().setModified(False)
+        self.note_title.setModified(False)
+
+    def set_editor(self, title, content):
+        self.loading_editor = True
+        try:
+            self.note_title.setText(title)
+            self.editor_preview = show_plain_text(self.note_content, self.content_loader, content)
+            self.note_content.setReadOnly(self.editor_preview)
+            self.reset_editor_modified()
+        finally:
+            self.loading_editor = False
+
     def update_current_note_from_editor(self):
+        # Only an edited editor is read back; untouched notes are never copied or compared.
+        if not self.editor_modified():
+            return
         title = self.note_title.text().strip()
-        content = self.note_content.toPlainText().strip()
+        content = self.editor_content()
+        self.reset_editor_modified()
         if title == "" and content == "":
             return
-        if self.current_note_index is not None and 0 <= self.current_note_index < len(self.notes):
-            note = self.notes[self.current_note_index]
+        if self.current_note is not None:
+            note = self.current_note
             if getattr(note, "deleted", False):
-                self.current_note_index = None
+                self.current_note = None
                 return
-            if note.title != title or note.content != content:
-                note.title = title
-                note.content = content
-                self.unsaved_changes = True
-                self.update_note_list()
+            note.title = title
+            note.content = content
+            self.mark_dirty(note)
+            self.note_model.note_changed(note)
         else:
-            if title or content:
-                new_note = Note(title, content)
-                self.notes.append(new_note)
-                self.current_note_index = len(self.notes) - 1
-                self.unsaved_changes = True
-                self.update_note_list()
+            new_note = Note(title, content)
+            self.add_note(new_note)
+            self.current_note = new_note
     
-    def addImageToCurrentNote(self, base64_str):
-        if self.current_note_index is None:
-            new_note = Note("", "", images=[base64_str])
-            self.notes.append(new_note)
-            self.current_note_index = len(self.notes) - 1
-            self.unsaved_changes = True
-            self.update_note_list()
-        else:
-            note = self.notes[self.current_note_index]
-            note.images.append(base64_str)
-            self.unsaved_changes = True
+    def addImageToCurrentNote(self, image):
+        if self.current_note is None:
+            self.current_note = Note("", "")
+            self.add_note(self.current_note)
+        self.ingest_pool.start(IngestTask(self.store, self.current_note.key, image, self.image_ingested))
+
+    def refresh_held_blobs(self):
+        if self.store is not None:
+            self.ingest_pool.start(RefreshHeldBlobsTask(self.store))
+
+    def on_image_ingested(self, note_key, key):
+        note = self.note_model.note(note_key)
+        if note is None or not key:
+            return
+        note.images.append(key)
+        self.mark_dirty(note)
     
     def new_note(self):
         self.update_current_note_from_editor()
-        self.note_title.clear()
-        self.note_content.clear()
+        self.set_editor("", "")
         self.imageViewer.clearImage()  # Clear the zoomable image viewer
-        self.imageViewer.setFixedWidth(self.note_list_widget.width())
-        self.current_note_index = None
-        self.note_list_widget.clearSelection()
+        self.imageViewer.setFixedWidth(self.note_list_view.width())
+        self.current_note = None
+        self.note_list_view.clearSelection()
         self.note_title.setFocus()
     
+    @traced("load_selected_note")
     def load_selected_note(self, current=None, previous=None):
         self.update_current_note_from_editor()
-        if current is None:
-            items = self.note_list_widget.selectedItems()
-            if not items:
+        if current is None or not current.isValid():
+            indexes = self.note_list_view.selectedIndexes()
+            if not indexes:
                 self.imageViewer.clearImage()
-                self.imageViewer.setFixedWidth(self.note_list_widget.width())
+                self.imageViewer.setFixedWidth(self.note_list_view.width())
                 return
-            current = items[0]
-        try:
-            index = current.data(Qt.ItemDataRole.UserRole)
-        except RuntimeError:
-            self.imageViewer.clearImage()
-            self.imageViewer.setFixedWidth(self.note_list_widget.width())
-            return
-        if index is None or not (0 <= index < len(self.notes)):
+            current = indexes[0]
+        note = self.note_for_index(current)
+        if note is None:
             self.imageViewer.clearImage()
-            self.imageViewer.setFixedWidth(self.note_list_widget.width())
+            self.imageViewer.setFixedWidth(self.note_list_view.width())
             return
-        note = self.notes[index]
-        self.current_note_index = index
-        self.note_title.setText(note.title)
-        self.note_content.setText(note.content)
+        self.current_note = note
+        self.show_in_editor(note)
+
+    def show_in_editor(self, note):
+        self.set_editor(note.title, note.content)
+        if self.editor_preview:
+            self.titleBar.setStatus("Large note: read-only preview")
         self.imageViewer.clearImage()
-        self.imageViewer.setFixedWidth(self.note_list_widget.width())
+        self.imageViewer.setFixedWidth(self.note_list_view.width())
         if note.images:
-            ba = QByteArray.fromBase64(note.images[0].encode())
-            pixmap = QPixmap()
-            pixmap.loadFromData(ba)
-            self.imageViewer.setImage(pixmap)
+            self.imageViewer.showBlob(self.image_cache, note.images[0])
     
     def save_note(self):
         title = self.note_title.text().strip()
-        content = self.note_content.toPlainText().strip()
+        content = self.editor_content()
         if title == "" and content == "":
-            self.current_note_index = None
-            self.unsaved_changes = False
+            self.current_note = None
             self.save_notes_to_file()  # This will remove deleted notes.
             return
         if title == "":
             from PyQt6.QtWidgets import QMessageBox
             QMessageBox.warning(self, "Input Error", "Missing a title")
             return
-        if self.current_note_index is None:
+        if self.current_note is None or getattr(self.current_note, "deleted", False):
             note = Note(title, content)
-            self.notes.append(note)
-            self.current_note_index = len(self.notes) - 1
-        else:
-            if getattr(self.notes[self.current_note_index], "deleted", False):
-                note = Note(title, content)
-                self.notes.append(note)
-                self.current_note_index = len(self.notes) - 1
-            else:
-                self.notes[self.current_note_index].title = title
-                self.notes[self.current_note_index].content = content
-        self.unsaved_changes = False
-        self.update_note_list()
+            self.add_note(note)
+            self.current_note = note
+        elif self.editor_modified():
+            note = self.current_note
+            note.title = title
+            note.content = content
+            self.mark_dirty(note)
+            self.note_model.note_changed(note)
+        self.reset_editor_modified()
         self.save_notes_to_file()
     
     def delete_note(self):
-        items = self.note_list_widget.selectedItems()
-        if not items:
-            return
-        item = items[0]
-        index = item.data(Qt.ItemDataRole.UserRole)
-        if index is None or index < 0 or index >= len(self.notes):
-            return
-        self.notes[index].deleted = True
-        self.unsaved_changes = True
-        if self.current_note_index == index:
-            self.current_note_index = None
-            self.note_title.clear()
-            self.note_content.clear()
+        indexes = self.note_list_view.selectedIndexes()
+        if not indexes:
+            return
+        note = self.note_for_index(indexes[0])
+        if note is None:
+            return
+        note.deleted = True
+        self.mark_dirty(note)
+        if self.current_note is note:
+            self.current_note = None
+            self.set_editor("", "")
             self.imageViewer.clearImage()
-        self.update_note_list()
+        self.note_model.note_changed(note)
+
+    def note_for_index(self, index):
+        key = index.data(Qt.ItemDataRole.UserRole)
+        return None if key is None else self.note_model.note(key)
     
-    def update_note_list(self):
-        self.note_list_widget.clear()
-        for i, note in enumerate(self.notes):
-            item = QListWidgetItem(note.title)
-            item.setData(Qt.ItemDataRole.UserRole, i)
-            # If the note is flagged as deleted, show it in red.
-            if getattr(note, "deleted", False):
-                item.setForeground(QColor("red"))
-            self.note_list_widget.addItem(item)
+    def cancel_search(self):
+        self.search_generation += 1
+        self.search_pool.clear()
+        if self.search_task is not None:
+            self.search_task.cancel()
+            self.search_task = None
+        self.notebook_search_pool.clear()
+        if self.notebook_search is not None:
+            self.notebook_search.cancel()
+            self.notebook_search = None
+
+    # Resets the list to the given notes; later changes go through the model incrementally.
+    @traced("update_note_list")
+    def update_note_list(self, notes):
+        self.stop_streaming()
+        self.cancel_search()
+        self.note_model.set_notes(notes)
 
+    @traced("search_notes")
     def search_notes(self):
         self.update_current_note_from_editor()
         query = self.search_input.text().lower()
-        self.note_list_widget.clear()
-        for i, note in enumerate(self.notes):
-            if query in note.title.lower() or query in note.content.lower():
-                item = QListWidgetItem(note.title)
-                item.setData(Qt.ItemDataRole.UserRole, i)
-                self.note_list_widget.addItem(item)
-    
-    def load_notes(self):
-        if not os.path.exists(NOTES_PATH):
+        self.cancel_search()
+        if self.index_batches is not None:
+            # Searched again once every note is listed.
+            return
+        if not query:
+            self.note_filter.set_filter(None)
+            self.restore_selection()
+            return
+        # The index only knows saved text; unsaved notes are matched by the task in memory.
+        dirty = [(note.key, note.id, note.title, note.content) for note in self.dirty_notes()]
+        self.search_task = SearchTask(self.store, self.search_generation, query, dirty)
+        self.search_task.signals.batch.connect(self.on_search_batch)
+        self.search_task.signals.finished.connect(self.on_search_finished)
+        self.search_pool.start(self.search_task)
+        # Other notebooks are only searched through their index, which needs a few characters.
+        others = [name for name in self.catalog.names() if name != self.notebook]
+        if others and len(query) >= SEARCH_INDEX_MIN_CHARS:
+            self.notebook_search = NotebookSearchTask(self.catalog, others, self.search_generation, query)
+            self.notebook_search.signals.finished.connect(self.on_notebook_search_finished)
+            self.notebook_search_pool.start(self.notebook_search)
+
+    def on_search_batch(self, generation, ids, keys):
+        if generation != self.search_generation:
+            return
+        if self.search_shown != generation:
+            # Keep the previous results on screen until the first batch arrives.
+            self.note_filter.set_filter([])
+            self.search_shown = generation
+        keys = [self.note_model.key_of_id(note_id) for note_id in ids] + keys
+        self.note_filter.add_matches([key for key in keys if key is not None])
+        if not self.note_list_view.currentIndex().isValid():
+            self.restore_selection()
+
+    # Re-selects the note in the editor after the filter changed, without reloading it.
+    def restore_selection(self):
+        if self.current_note is None:
+            return
+        index = self.note_filter.index_of(self.current_note.key)
+        if index.isValid():
+            selection = self.note_list_view.selectionModel()
+            selection.blockSignals(True)
+            selection.setCurrentIndex(index, selection.SelectionFlag.ClearAndSelect)
+            selection.blockSignals(False)
+            self.note_list_view.viewport().update()
+
+    def on_search_finished(self, generation):
+        if generation == self.search_generation:
+            self.search_task = None
+
+    def on_notebook_search_finished(self, generation, counts):
+        if generation != self.search_generation:
+            return
+        self.notebook_search = None
+        if counts:
+            found = ", ".join(
+                f"{name} ({'%d+' % count if count >= NOTEBOOK_SEARCH_LIMIT else count})" for name, count in counts.items()
+            )
+            self.titleBar.setStatus(f"Also in: {found}")
+
+    def open_store(self):
+        if self.notebook != DEFAULT_NOTEBOOK:
+            return self.catalog.open(self.notebook)
+        try:
+            bundled_notes = os.path.join(sys._MEIPASS, "resources", "notes.json")
+        except Exception:
+            bundled_notes = os.path.join(os.path.dirname(__file__), "resources", "notes.json")
+        return self.catalog.open(self.notebook, seed_json=bundled_notes)
+
+    # Waits for everything still using the open notebook, then closes it; the next
+    # ensure_store opens self.notebook. Unsaved changes must have been dealt with before.
+    def close_store(self):
+        if self.store is None:
+            return
+        for task in self.export_tasks:
+            task.cancelled.set()
+        self.export_pool.waitForDone()
+        self.persistence.wait()
+        self.cancel_search()
+        self.search_pool.waitForDone()
+        self.notebook_search_pool.waitForDone()
+        self.ingest_pool.waitForDone()
+        for viewer in list(self.viewers.values()):
+            viewer.close()
+        self.current_note = None
+        self.dirty_keys.clear()
+        self.set_editor("", "")
+        self.imageViewer.clearImage()
+        self.watcher.stop()
+        self.residency.clear()
+        self.image_cache.deleteLater()
+        self.image_cache = self.residency = None
+        try:
+            self.catalog.remember(self.notebook, self.store)
+        except (OSError, sqlite3.Error) as e:
+            print("Error updating the notebook catalog:", e)
+        self.store.close()
+        self.store = None
+
+    def window_title(self):
+        return "xynNotes" if self.notebook == DEFAULT_NOTEBOOK else f"xynNotes - {self.notebook}"
+
+    # Lists the notebooks with their note counts as of when each was last closed.
+    def refresh_notebook_box(self):
+        self.notebook_box.blockSignals(True)
+        self.notebook_box.clear()
+        for name in self.catalog.names():
+            info = self.catalog.info.get(name)
+            label = name if info is None or name == self.notebook else f"{name} ({info['notes']})"
+            self.notebook_box.addItem(label, name)
+        self.notebook_box.addItem("New Notebook...", None)
+        self.notebook_box.setCurrentIndex(max(self.notebook_box.findData(self.notebook), 0))
+        self.notebook_box.blockSignals(False)
+
+    def on_notebook_chosen(self, index):
+        name = self.notebook_box.itemData(index)
+        if name is None:
+            dlg = NameDialog(self, title="New Notebook", placeholder="Name of the notebook")
+            if dlg.exec() != QDialog.DialogCode.Accepted or not dlg.getName():
+                self.refresh_notebook_box()
+                return
             try:
-                bundled_notes = os.path.join(sys._MEIPASS, "resources", "notes.json")
-            except Exception:
-                bundled_notes = os.path.join(os.path.dirname(__file__), "resources", "notes.json")
-            if os.path.exists(bundled_notes):
-                shutil.copy(bundled_notes, NOTES_PATH)
-            else:
-                # Create an empty notes file.
-                with open(NOTES_PATH, "w", encoding="utf-8") as f:
-                    json.dump([], f)
-        # Load the notes from NOTES_PATH.
+                name = self.catalog.create(dlg.getName())
+            except (ValueError, OSError, sqlite3.Error) as e:
+                self.refresh_notebook_box()
+                CustomInfoDialog(self, title="New Notebook", message=str(e)).exec()
+                return
+        self.switch_notebook(name)
+
+    # Saves and closes the open notebook, then streams the chosen one in.
+    def switch_notebook(self, name):
+        if name == self.notebook:
+            return
+        self.update_current_note_from_editor()
+        if self.unsaved_changes and not self.save_notes_to_file(wait=True):
+            self.refresh_notebook_box()
+            return
+        self.close_store()
+        self.notebook = name
+        self.catalog.set_active(name)
+        self.refresh_notebook_box()
+        self.titleBar.titleLabel.setText(self.window_title())
+        self.titleBar.setStatus("")
+        self.stream_notes()
+
+    def ensure_store(self):
+        if self.store is None:
+            self.store = self.open_store()
+            self.image_cache = ImageCache(self.store.blobs, IMAGE_CACHE_MB * 1024 * 1024, self)
+            self.residency = NoteResidency(self.store, NOTE_CACHE_MB * 1024 * 1024, self.note_pinned)
+            self.watcher.watch(self.store)
+
+    # Notes whose body must stay in memory: the one in the editor, unsaved ones and those being saved.
+    def note_pinned(self, note):
+        return note is self.current_note or note.key in self.dirty_keys or self.persistence.is_saving(note.key)
+
+    @traced("load_notes")
+    def load_notes(self):
+        # Load the notes of the active notebook.
         try:
-            with open(NOTES_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.notes = [Note(item["title"], item["content"], item.get("images", [])) for item in data]
-                self.update_note_list()
+            self.ensure_store()
+            self.residency.clear()
+            self.synced_seq = self.store.change_seq()
+            self.update_note_list([
+                Note.from_index(note_id, title, self.residency, self.synced_seq)
+                for note_id, title in self.store.load_index()
+            ])
         except Exception as e:
             print("Error loading notes:", e)
-            self.notes = []
-    
-    def save_notes_to_file(self):
-        # Permanently remove all notes that are flagged as deleted.
-        self.notes = [note for note in self.notes if not getattr(note, "deleted", False)]
-        data = [{"title": note.title, "content": note.content, "images": note.images} for note in self.notes]
+            self.update_note_list([])
+
+    # Like load_notes, but reads the index a batch per event loop turn so the window stays live.
+    @traced("stream_notes")
+    def stream_notes(self):
         try:
-            with open(NOTES_PATH, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
-            self.unsaved_changes = False
-            self.update_note_list()
+            self.ensure_store()
+            self.residency.clear()
+            self.update_note_list([])
+            self.synced_seq = self.store.change_seq()
+            self.index_batches = self.store.iter_index(INDEX_BATCH_SIZE)
         except Exception as e:
-            print("Error saving notes:", e)
+            print("Error loading notes:", e)
+            self.update_note_list([])
+            return
+        self.index_timer.start(0)
+
+    @traced("load_index_batch")
+    def load_index_batch(self):
+        try:
+            rows = next(self.index_batches, None)
+        except Exception as e:
+            print("Error loading notes:", e)
+            rows = None
+        if rows:
+            self.note_model.extend([
+                Note.from_index(note_id, title, self.residency, self.synced_seq) for note_id, title in rows
+            ])
+            tracer.mark("first_notes")
+            return
+        self.stop_streaming()
+        tracer.mark("interactive")
+        if self.search_input.text():
+            self.search_notes()
+        # Changes saved elsewhere while the list was filling in.
+        self.merge_external_changes()
+
+    # Brings in what other windows or scripts saved since the list was last in sync. Only the
+    # changed notes are read, through the store's change index. Notes with unsaved edits here
+    # are left alone; saving them later keeps both versions.
+    @traced("merge_changes")
+    def merge_external_changes(self):
+        # Own saves are reconciled in on_notes_saved first; a list still filling in is merged once done.
+        if self.store is None or self.index_batches is not None or self.persistence.in_flight is not None:
+            return
+        try:
+            rows = self.store.changes_since(self.synced_seq)
+        except sqlite3.Error as e:
+            print("Error reading changes:", e)
+            return
+        if not rows:
+            return
+        self.update_current_note_from_editor()
+        added, removed, conflicts = [], [], []
+        for note_id, title, deleted, changed in rows:
+            self.synced_seq = max(self.synced_seq, changed)
+            key = self.note_model.key_of_id(note_id)
+            note = None if key is None else self.note_model.note(key)
+            if note is None:
+                if not deleted:
+                    added.append(Note.from_index(note_id, title, self.residency, changed))
+                continue
+            if note.base is not None and note.base >= changed:
+                continue  # Written by this window.
+            if note.key in self.dirty_keys:
+                conflicts.append(note.title)
+                continue
+            if deleted:
+                removed.append(note)
+                continue
+            note.base = changed
+            note.title = sys.intern(title)
+            self.residency.forget(note)
+            note.unload()
+            self.note_model.note_changed(note)
+            if note is self.current_note:
+                self.show_in_editor(note)
+            viewer = self.viewers.get(note.key)
+            if viewer is not None:
+                viewer.show_note(note)
+        for note in removed:
+            self.residency.forget(note)
+            viewer = self.viewers.get(note.key)
+            if viewer is not None:
+                viewer.close()
+            if note is self.current_note:
+                self.current_note = None
+                self.set_editor("", "")
+                self.imageViewer.clearImage()
+        self.note_model.remove(removed)
+        self.note_model.extend(added)
+        if conflicts:
+            self.titleBar.setStatus("Also changed elsewhere: " + ", ".join(conflicts))
+
+    def stop_streaming(self):
+        self.index_timer.stop()
+        self.index_batches = None
+    
+    def dirty_notes(self):
+        notes = (self.note_model.note(key) for key in self.dirty_keys)
+        return [note for note in notes if note is not None]
+
+    # Returns right away; the write happens on the persistence thread unless wait is set.
+    @traced("save_notes_to_file")
+    def save_notes_to_file(self, wait=False):
+        if wait:
+            return self.persistence.flush_and_wait()
+        self.persistence.flush()
+        return True
+
+    def snapshot_dirty_notes(self, service):
+        self.update_current_note_from_editor()
+        # Only dirty notes are written; notes flagged as deleted become tombstones.
+        dirty = self.dirty_notes()
+        self.dirty_keys.clear()
+        if not dirty:
+            return None
+        changed = [
+            NoteRecord(note.key, note.id, note.title, note.content, note.images, note.base)
+            for note in dirty if not getattr(note, "deleted", False)
+        ]
+        deleted = [
+            NoteRecord(note.key, note.id, "", "", (), note.base) for note in dirty if getattr(note, "deleted", False)
+        ]
+        self.titleBar.setStatus("Saving...")
+        return SaveTask(service, self.store, changed, deleted, time.time())
+
+    def on_notes_saved(self, task):
+        if task.error:
+            print("Error saving notes:", task.error)
+            for record in task.changed + task.deleted:
+                if self.note_model.note(record.key) is not None:
+                    self.dirty_keys.add(record.key)
+            self.titleBar.setStatus(f"Save failed: {task.error}")
+            return
+        saved = []
+        conflicts = []
+        for record in task.changed:
+            note = self.note_model.note(record.key)
+            if note is None:
+                continue
+            if record.conflict:
+                # Changed elsewhere meanwhile; this version was saved as a new note next to it.
+                # Looking at the changes again from where this one was read lists the other.
+                self.synced_seq = min(self.synced_seq, note.base)
+                conflicts.append(record.title)
+                self.note_model.forget_id(note.id)
+                note.id = None
+                if record.key not in self.dirty_keys:
+                    note.title = record.title
+                    self.note_model.note_changed(note)
+                    if note is self.current_note and not self.note_title.isModified():
+                        self.note_title.setText(note.title)
+            note.base = record.base
+            if note.id is None:
+                note.id = record.id
+                saved.append(note)
+                # Saved now, so its body may be dropped and read back like any other.
+                self.residency.adopt(note)
+        self.note_model.notes_saved(saved)
+        # Permanently remove all notes that are flagged as deleted. Notes edited elsewhere
+        # meanwhile were kept in the store and come back with their new version.
+        deleted = []
+        for record in task.deleted:
+            note = self.note_model.note(record.key)
+            if note is not None and note.deleted:
+                deleted.append(note)
+                if record.conflict:
+                    self.synced_seq = min(self.synced_seq, note.base)
+                    conflicts.append(note.title)
+        for note in deleted:
+            self.residency.forget(note)
+        self.note_model.remove(deleted)
+        if conflicts:
+            self.titleBar.setStatus("Changed elsewhere meanwhile, not overwritten: " + ", ".join(conflicts))
+        else:
+            self.titleBar.setStatus("Saved " + time.strftime("%H:%M:%S"))
+        # Changes that arrived while saving were held back.
+        self.merge_external_changes()
     
-    def open_viewer(self, item):
-        index = item.data(Qt.ItemDataRole.UserRole)
-        note = self.notes[index]
-        viewer = NoteViewer(note)
+    def dump_trace(self):
+        try:
+            path = tracer.dump(DATA_DIR)
+        except OSError as e:
+            print("Error writing trace:", e)
+            return
+        self.titleBar.setStatus("Trace written to " + os.path.basename(path))
+
+    def open_viewer(self, index):
+        note = self.note_for_index(index)
+        if note is None:
+            return
+        viewer = self.viewers.get(note.key)
+        if viewer is not None:
+            if viewer.isMinimized():
+                viewer.showNormal()
+            viewer.raise_()
+            viewer.activateWindow()
+            return
+        if self.viewer_pool:
+            viewer = self.viewer_pool.pop()
+            # The pool outlives notebook switches; use the cache of the open one.
+            viewer.image_cache = self.image_cache
+        else:
+            viewer = NoteViewer(self.image_cache)
+            viewer.closed.connect(self.on_viewer_closed)
+        viewer.show_note(note)
+        self.viewers[note.key] = viewer
         viewer.show()
-        self.viewers.append(viewer)
+
+    def on_viewer_closed(self, viewer):
+        for key, open_viewer in list(self.viewers.items()):
+            if open_viewer is viewer:
+                del self.viewers[key]
+        if len(self.viewer_pool) < VIEWER_POOL_SIZE:
+            self.viewer_pool.append(viewer)
+        else:
+            viewer.deleteLater()
     
     def navigate_up(self):
         self.update_current_note_from_editor()
-        self.note_list_widget.setFocus()
-        count = self.note_list_widget.count()
+        self.note_list_view.setFocus()
+        count = self.note_filter.rowCount()
         if count == 0:
             return
-        row = self.note_list_widget.currentRow()
+        row = self.note_list_view.currentIndex().row()
         if row == -1:
-            self.note_list_widget.setCurrentRow(0)
+            self.note_list_view.setCurrentIndex(self.note_filter.index(0))
         elif row > 0:
-            self.note_list_widget.setCurrentRow(row - 1)
+            self.note_list_view.setCurrentIndex(self.note_filter.index(row - 1))
+        self.prefetch_neighbors()
     
     def navigate_down(self):
         self.update_current_note_from_editor()
-        self.note_list_widget.setFocus()
-        count = self.note_list_widget.count()
+        self.note_list_view.setFocus()
+        count = self.note_filter.rowCount()
         if count == 0:
             return
-        row = self.note_list_widget.currentRow()
+        row = self.note_list_view.currentIndex().row()
         if row == -1:
-            self.note_list_widget.setCurrentRow(0)
+            self.note_list_view.setCurrentIndex(self.note_filter.index(0))
         elif row < count - 1:
-            self.note_list_widget.setCurrentRow(row + 1)
+            self.note_list_view.setCurrentIndex(self.note_filter.index(row + 1))
+        self.prefetch_neighbors()
     
+    # Decode the images of the notes around the selection before they are navigated to.
+    def prefetch_neighbors(self, distance=2):
+        row = self.note_list_view.currentIndex().row()
+        keys = []
+        for neighbor in range(row - distance, row + distance + 1):
+            if neighbor == row or not (0 <= neighbor < self.note_filter.rowCount()):
+                continue
+            note = self.note_filter.note_at(neighbor)
+            if note is None:
+                continue
+            images = note.images if note.loaded or note.id is None else self.store.load_images(note.id)
+            keys.extend(images[:1])
+        self.image_cache.prefetch(keys)
+
     # Context menu for note list.
     def on_note_list_context_menu(self, pos):
-        item = self.note_list_widget.itemAt(pos)
-        if not item:
+        note = self.note_for_index(self.note_list_view.indexAt(pos))
+        if note is None:
             return
-        menu = QMenu(self.note_list_widget)
+        menu = QMenu(self.note_list_view)
         export_action = menu.addAction("Export")
+        export_listed_action = menu.addAction("Export Listed")
         edit_action = menu.addAction("Edit")
         dupe_action = menu.addAction("Dupe")
         
-        export_action.triggered.connect(lambda: self.export_note(item))
-        edit_action.triggered.connect(lambda: self.edit_note(item))
-        dupe_action.triggered.connect(lambda: self.dupe_note(item))
+        export_action.triggered.connect(lambda: self.export_note(note))
+        export_listed_action.triggered.connect(self.export_listed_notes)
+        edit_action.triggered.connect(lambda: self.edit_note(note))
+        dupe_action.triggered.connect(lambda: self.dupe_note(note))
         
-        menu.exec(self.note_list_widget.mapToGlobal(pos))
+        menu.exec(self.note_list_view.mapToGlobal(pos))
     
     def open_context_menu_for_current_item(self):
-        item = self.note_list_widget.currentItem()
-        if item:
-            rect = self.note_list_widget.visualItemRect(item)
-            pos_global = self.note_list_widget.viewport().mapToGlobal(rect.center())
-            pos_local = self.note_list_widget.mapFromGlobal(pos_global)
+        index = self.note_list_view.currentIndex()
+        if index.isValid():
+            rect = self.note_list_view.visualRect(index)
+            pos_global = self.note_list_view.viewport().mapToGlobal(rect.center())
+            pos_local = self.note_list_view.mapFromGlobal(pos_global)
             self.on_note_list_context_menu(pos_local)
     
-    def export_note(self, item):
+    def export_note(self, note):
         self.update_current_note_from_editor()
-        index = item.data(Qt.ItemDataRole.UserRole)
-        note = self.notes[index]
-        dlg = ExportDialog(self)
+        dlg = ExportDialog(self, destination=os.getcwd())
         if dlg.exec() == QDialog.DialogCode.Accepted:
             ext = dlg.getExtension()
-            if ext:
-                filename = f"{note.title}.{ext}"
-                try:
-                    with open(filename, "w", encoding="utf-8") as f:
-                        f.write(note.content)
-                    confirm = CustomInfoDialog(self, title="Export Confirmation", message=f"Note exported as {filename}")
-                    confirm.exec()
-                except Exception as e:
-                    from PyQt6.QtWidgets import QMessageBox
-                    QMessageBox.warning(self, "Export Error", f"Failed to export note: {e}")
+            if ext and dlg.getDestination():
+                self.start_export([note], dlg.getDestination(), ext, numbered=False)
+
+    # Exports every note in the list as it is shown, i.e. the search results while searching.
+    def export_listed_notes(self):
+        self.update_current_note_from_editor()
+        notes = [self.note_filter.note_at(row) for row in range(self.note_filter.rowCount())]
+        notes = [note for note in notes if note is not None and not note.deleted]
+        if not notes:
+            return
+        default = os.path.join(os.getcwd(), time.strftime("xynnotes-%Y%m%d-%H%M%S.zip"))
+        dlg = ExportDialog(self, title=f"Export {len(notes)} Notes", destination=default)
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            ext = dlg.getExtension()
+            if ext and dlg.getDestination():
+                self.start_export(notes, dlg.getDestination(), ext, numbered=True)
+
+    def start_export(self, notes, target, ext, numbered):
+        # Saved notes are read by the workers; notes with unsaved changes go as they are now.
+        items = [
+            NoteRecord(note.key, note.id, note.title, note.content, note.images)
+            if note.id is None or note.key in self.dirty_keys else note.id
+            for note in notes
+        ]
+        task = ExportTask(self.store, items, target, ext, numbered)
+        task.signals.progress.connect(self.on_export_progress)
+        task.signals.finished.connect(lambda done, target, error: self.on_export_finished(task, done, target, error))
+        self.export_tasks.append(task)
+        self.export_pool.start(task)
+
+    def on_export_progress(self, done, total):
+        self.titleBar.setStatus(f"Exporting {done}/{total}")
+
+    def on_export_finished(self, task, done, target, error):
+        if task in self.export_tasks:
+            self.export_tasks.remove(task)
+        if error:
+            self.titleBar.setStatus("Export failed")
+            from PyQt6.QtWidgets import QMessageBox
+            QMessageBox.warning(self, "Export Error", f"Failed to export notes: {error}")
+            return
+        self.titleBar.setStatus(f"Exported {done} notes")
+        if len(task.notes) == 1 and not task.cancelled.is_set():
+            confirm = CustomInfoDialog(self, title="Export Confirmation", message=f"Note exported to {target}")
+            confirm.exec()
     
-    def edit_note(self, item):
-        self.note_list_widget.setCurrentItem(item)
-        self.load_selected_note(item)
+    def edit_note(self, note):
+        index = self.note_filter.index_of(note.key)
+        self.note_list_view.setCurrentIndex(index)
+        self.load_selected_note(index)
         self.note_content.setFocus()
     
-    def dupe_note(self, item):
+    def dupe_note(self, orig):
         self.update_current_note_from_editor()
-        index = item.data(Qt.ItemDataRole.UserRole)
-        orig = self.notes[index]
         dup_title = f"Copy - {orig.title}"
         dup_note = Note(dup_title, orig.content, orig.images.copy())
-        self.notes.append(dup_note)
-        self.update_note_list()
+        self.add_note(dup_note)
         dlg = CustomInfoDialog(self, title="Dupe Confirmation", message=f"Note duplicated as '{dup_title}'")
         dlg.exec()
     
@@ -717,8 +2539,10 @@ class MainWindow(QMainWindow):
             dlg = ClosePromptDialog(self)
             if dlg.exec() == QDialog.DialogCode.Accepted:
                 if dlg.choice == "save":
-                    self.save_notes_to_file()
-                    event.accept()
+                    if self.save_notes_to_file(wait=True):
+                        event.accept()
+                    else:
+                        event.ignore()
                 elif dlg.choice == "quit":
                     event.accept()
                 else:
@@ -727,9 +2551,20 @@ class MainWindow(QMainWindow):
                 event.ignore()
         else:
             event.accept()
+        if event.isAccepted():
+            self.close_store()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = MainWindow()
+    for arg in sys.argv[1:]:
+        # --trace=<operation> also captures a cProfile of that operation.
+        if arg == "--trace" or arg.startswith("--trace="):
+            tracer.enable(arg.partition("=")[2])
+    if tracer.enabled:
+        watchdog = StallWatchdog(parent=app)
+        watchdog.start()
+        app.aboutToQuit.connect(lambda: tracer.dump(DATA_DIR))
+    window = MainWindow(stream_notes=True)
+    tracer.mark("window")
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,1525 @@
+import base64
+import collections
+import concurrent.futures
+import contextlib
+import difflib
+import glob
+import hashlib
+import io
+import itertools
+import json
+import lzma
+import os
+import pathlib
+import re
+import sqlite3
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+
+# Where the application keeps its notes unless told otherwise.
+def default_data_dir():
+    from appdirs import user_data_dir
+    return user_data_dir("xynNotes", "xynLabs")
+
+# Compact once this many tombstones have piled up.
+COMPACT_THRESHOLD = 200
+# Saves look for unreferenced blobs (and try to learn the compression dictionary) at most this
+# often, in seconds, and after a compaction. Both read the whole notebook, which a save should not.
+COLLECT_INTERVAL = 600
+# Bytes of the database file SQLite may map into memory for reads.
+MMAP_SIZE = 1 << 30
+# The search index is made of trigrams; shorter queries are matched by scanning every note.
+SEARCH_INDEX_MIN_CHARS = 3
+# Images pasted into notes that are not saved yet are held in the pending_blobs table by the
+# instance that has them, which renews its holds this often while it runs. Holds not renewed
+# for PENDING_BLOB_EXPIRY_SECONDS belong to an instance that died and are dropped.
+PENDING_BLOB_REFRESH_SECONDS = 3600
+PENDING_BLOB_EXPIRY_SECONDS = 7 * 86400
+
+# Writes data to a temporary file, flushes it to disk and renames it over path.
+def atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def is_blob_key(ref):
+    return len(ref) == 64 and all(c in "0123456789abcdef" for c in ref)
+
+def _blob_refs(images, put):
+    # Legacy records carry base64 image data; move it into the blob store with put(data).
+    return [ref if is_blob_key(ref) else put(base64.b64decode(ref)) for ref in images]
+
+def _migrate_inline_images(backend):
+    rows = backend.conn.execute("SELECT id, images FROM notes WHERE images != '[]'").fetchall()
+    for note_id, images in rows:
+        backend.conn.execute(
+            "UPDATE notes SET images = ? WHERE id = ?",
+            (json.dumps(_blob_refs(json.loads(images), backend.blobs.put)), note_id),
+        )
+
+# ---------------------------
+# Content-Addressed Blob Store
+# ---------------------------
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    @staticmethod
+    def key_for(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def put(self, data):
+        key = self.key_for(data)
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        else:
+            # Refresh the mtime so a pending garbage collection keeps it.
+            os.utime(path)
+        return key
+
+    # Files derived from a blob (such as thumbnails) live next to it and are collected with it.
+    def derived_path(self, key, suffix):
+        return f"{self.path(key)}.{suffix}"
+
+    # Marks a blob as in use again; False if it has been collected.
+    def touch(self, key):
+        try:
+            os.utime(self.path(key))
+            return True
+        except OSError:
+            return False
+
+    def get(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def keys(self):
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                for blob in os.scandir(entry.path):
+                    if is_blob_key(blob.name):
+                        yield blob.name, blob.stat().st_mtime
+
+    def collect(self, referenced, before):
+        # Blobs written after `before` may belong to a save or import still in progress.
+        for key, mtime in list(self.keys()):
+            if key not in referenced and mtime < before:
+                for path in [self.path(key)] + glob.glob(glob.escape(self.path(key)) + ".*"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+# Trigram full-text index over the notes table, kept current by triggers.
+SEARCH_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE notes_fts USING fts5(
+    title, content, content='notes', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+END;
+CREATE TRIGGER notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+INSERT INTO notes_fts (notes_fts) VALUES ('rebuild');
+"""
+
+def _create_search_index(backend):
+    try:
+        backend.conn.executescript(SEARCH_INDEX_SCHEMA)
+    except sqlite3.OperationalError as e:
+        # SQLite was built without FTS5; search falls back to scanning.
+        print("Full-text index unavailable:", e)
+
+def _contains(text, query):
+    return query in text.lower()
+
+# ---------------------------
+# Record Compression
+# ---------------------------
+# How note content is compressed at rest: zlib, lzma, zstd (when a zstd module is installed) or
+# none. Records say how they were packed, so changing this only affects later writes.
+COMPRESSION = os.environ.get("XYNNOTES_COMPRESSION", "zlib").lower()
+# Content shorter than this many UTF-8 bytes stays plain text; it would not shrink.
+COMPRESS_MIN_BYTES = 64
+# zlib content up to this size is compressed against the shared dictionary, where it helps most.
+DICTIONARY_MAX_BYTES = 4096
+DICTIONARY_SIZE = 32 * 1024
+# The dictionary is built from the notebook once it has this many notes to learn from.
+DICTIONARY_MIN_NOTES = 100
+
+# First byte of a packed record. Plain records are stored as TEXT, packed ones as BLOB.
+_ZLIB, _ZLIB_DICT, _LZMA, _ZSTD = 1, 2, 3, 4
+
+try:
+    from compression import zstd as _zstd  # Python 3.14+
+    _zstd_compress, _zstd_decompress = _zstd.compress, _zstd.decompress
+except ImportError:
+    try:
+        import zstandard as _zstd
+        _zstd_compress = lambda data: _zstd.ZstdCompressor().compress(data)
+        _zstd_decompress = lambda data: _zstd.ZstdDecompressor().decompress(data)
+    except ImportError:
+        _zstd = None
+
+# Returns content as stored: the text itself, or a tagged compressed BLOB when that is smaller.
+def pack_text(text, codec, zdict=None):
+    data = text.encode("utf-8")
+    if codec == "none" or len(data) < COMPRESS_MIN_BYTES:
+        return text
+    if codec == "lzma":
+        packed = bytes([_LZMA]) + lzma.compress(data, preset=1)
+    elif codec == "zstd" and _zstd is not None:
+        packed = bytes([_ZSTD]) + _zstd_compress(data)
+    elif zdict and len(data) <= DICTIONARY_MAX_BYTES:
+        compressor = zlib.compressobj(6, zdict=zdict)
+        packed = bytes([_ZLIB_DICT]) + compressor.compress(data) + compressor.flush()
+    else:
+        packed = bytes([_ZLIB]) + zlib.compress(data, 6)
+    return packed if len(packed) < len(data) else text
+
+def unpack_text(value, zdict=None):
+    if value is None or isinstance(value, str):
+        return value
+    tag, payload = value[0], memoryview(value)[1:]
+    if tag == _ZLIB:
+        data = zlib.decompress(payload)
+    elif tag == _ZLIB_DICT:
+        decompressor = zlib.decompressobj(zdict=zdict)
+        data = decompressor.decompress(payload) + decompressor.flush()
+    elif tag == _LZMA:
+        data = lzma.decompress(payload)
+    elif tag == _ZSTD and _zstd is not None:
+        data = _zstd_decompress(bytes(payload))
+    else:
+        raise ValueError(f"Unknown record encoding {tag}")
+    return data.decode("utf-8")
+
+# A zlib preset dictionary from the words most common in the given texts, most frequent last
+# (zlib finds matches near the end of the dictionary most cheaply).
+def train_dictionary(texts, size=DICTIONARY_SIZE):
+    counts = collections.Counter()
+    for text in texts:
+        counts.update(re.findall(r"\S+", text))
+    words, length = [], 0
+    for word, count in counts.most_common():
+        if count < 2 or length + len(word) + 1 > size:
+            break
+        words.append(word)
+        length += len(word.encode("utf-8")) + 1
+    return " ".join(reversed(words)).encode("utf-8")
+
+# The search index reads note text through a view that unpacks it.
+COMPRESSED_SEARCH_INDEX_SCHEMA = """
+CREATE VIEW notes_text AS SELECT id, title, xyn_text(content) AS content FROM notes;
+CREATE VIRTUAL TABLE notes_fts USING fts5(
+    title, content, content='notes_text', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, xyn_text(new.content));
+END;
+CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, xyn_text(old.content));
+END;
+CREATE TRIGGER notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, xyn_text(old.content));
+    INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, xyn_text(new.content));
+END;
+INSERT INTO notes_fts (notes_fts) VALUES ('rebuild');
+"""
+
+def _compress_records(backend):
+    had_index = backend.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone()
+    # The old index triggers would index the packed bytes; they are replaced below.
+    backend.conn.executescript("""
+        DROP TRIGGER IF EXISTS notes_fts_insert;
+        DROP TRIGGER IF EXISTS notes_fts_delete;
+        DROP TRIGGER IF EXISTS notes_fts_update;
+        DROP TABLE IF EXISTS notes_fts;
+    """)
+    last = 0
+    while True:
+        rows = backend.conn.execute(
+            "SELECT id, content FROM notes WHERE id > ? AND deleted = 0 ORDER BY id LIMIT 1000", (last,)
+        ).fetchall()
+        if not rows:
+            break
+        backend.conn.executemany(
+            "UPDATE notes SET content = ? WHERE id = ?",
+            [(pack_text(content, backend.compression), note_id) for note_id, content in rows],
+        )
+        last = rows[-1][0]
+    if had_index:
+        try:
+            backend.conn.executescript(COMPRESSED_SEARCH_INDEX_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print("Full-text index unavailable:", e)
+
+# The search index holds the plain text of each live note without a copy of it (content=''). It
+# is written by SqliteBackend rather than by triggers, which would need xynstore's SQL functions
+# to unpack the text, so the database stays writable with plain SQL. `indexed` is the `changed`
+# stamp a note had when it was indexed; notes written by others differ, and the index is then
+# rebuilt (see SqliteBackend.refresh_search_index).
+SEARCH_INDEX_TABLE = "CREATE VIRTUAL TABLE notes_fts USING fts5(title, content, content='', tokenize='trigram');"
+
+def _index_without_triggers(backend):
+    had_index = backend.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone()
+    backend.conn.executescript("""
+        DROP TRIGGER IF EXISTS notes_fts_insert;
+        DROP TRIGGER IF EXISTS notes_fts_delete;
+        DROP TRIGGER IF EXISTS notes_fts_update;
+        DROP TABLE IF EXISTS notes_fts;
+        DROP VIEW IF EXISTS notes_text;
+        ALTER TABLE notes ADD COLUMN indexed INTEGER NOT NULL DEFAULT 0;
+        CREATE INDEX notes_unindexed ON notes (id) WHERE deleted = 0 AND indexed != changed;
+    """)
+    if had_index:
+        # Filled when the store is opened, as no note counts as indexed.
+        backend.conn.executescript(SEARCH_INDEX_TABLE)
+        backend.conn.execute("UPDATE notes SET indexed = -1")
+
+# ---------------------------
+# Revision History
+# ---------------------------
+# Revisions keep the states a note had before each save. Each one is stored as a delta that
+# turns the next newer state back into it, so the current note never has to be rewritten and
+# the oldest revisions can be dropped without touching the rest. Images are kept by blob key.
+# Revisions older than this many days are pruned, except the newest few of each live note.
+HISTORY_DAYS = float(os.environ.get("XYNNOTES_HISTORY_DAYS", "90"))
+HISTORY_KEEP_REVISIONS = 20
+# Every this many revisions of a note one stores the full text, bounding how many deltas a
+# restore has to apply.
+HISTORY_SNAPSHOT_EVERY = 32
+# A state that lasted less than this many seconds before being saved over is folded into the
+# revision before it, so autosaves while typing don't each become a revision.
+HISTORY_COALESCE_SECONDS = 300
+HISTORY_PRUNE_INTERVAL = 3600
+
+# A list of [start, end] line ranges copied from `newer` and strings inserted between them.
+def text_delta(newer, older):
+    newer_lines = newer.splitlines(keepends=True)
+    older_lines = older.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, newer_lines, older_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            text = "".join(older_lines[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += text
+            else:
+                ops.append(text)
+    return ops
+
+def apply_delta(newer, ops):
+    newer_lines = newer.splitlines(keepends=True)
+    return "".join(op if isinstance(op, str) else "".join(newer_lines[op[0]:op[1]]) for op in ops)
+
+HISTORY_SCHEMA = """
+CREATE TABLE revisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    note_id INTEGER NOT NULL,
+    time REAL NOT NULL,
+    title TEXT NOT NULL,
+    images TEXT NOT NULL,
+    snapshot INTEGER NOT NULL,
+    data NOT NULL
+);
+CREATE INDEX revisions_notes ON revisions (note_id, id);
+CREATE INDEX revisions_time ON revisions (time);
+"""
+
+# Every write to a note stamps it with the next value of a store-wide sequence, whoever the
+# writer is, so readers can find what changed since they last looked through an index.
+CHANGE_TRACKING_SCHEMA = """
+ALTER TABLE notes ADD COLUMN changed INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX notes_changed ON notes (changed);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('seq', 0);
+CREATE TRIGGER notes_seq_insert AFTER INSERT ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'seq';
+    UPDATE notes SET changed = (SELECT value FROM meta WHERE key = 'seq') WHERE id = new.id;
+END;
+CREATE TRIGGER notes_seq_update AFTER UPDATE OF title, content, images, deleted ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'seq';
+    UPDATE notes SET changed = (SELECT value FROM meta WHERE key = 'seq') WHERE id = new.id;
+END;
+"""
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Entries are either SQL scripts or callables taking the backend.
+MIGRATIONS = [
+    """
+    CREATE TABLE notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        images TEXT NOT NULL DEFAULT '[]',
+        deleted INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    """,
+    _migrate_inline_images,
+    # Covering index so the startup title scan never touches note bodies.
+    "CREATE INDEX notes_titles ON notes (deleted, id, title);",
+    _create_search_index,
+    # Maps a hash of decoded pixels to the blob they were encoded into.
+    "CREATE TABLE image_hashes (pixel_hash TEXT PRIMARY KEY, blob TEXT NOT NULL);",
+    _compress_records,
+    # `time` is when the revision was saved over; `data` is packed text, or a packed JSON delta.
+    HISTORY_SCHEMA,
+    CHANGE_TRACKING_SCHEMA,
+    # Tombstones outlive compaction here, so other instances still learn about the deletions.
+    """
+    CREATE TABLE deletions (id INTEGER PRIMARY KEY, changed INTEGER NOT NULL);
+    CREATE INDEX deletions_changed ON deletions (changed);
+    """,
+    # Blobs held by a running instance for notes it has not saved; `owner` tells instances apart.
+    "CREATE TABLE pending_blobs (blob TEXT NOT NULL, owner TEXT NOT NULL, updated REAL NOT NULL, "
+    "PRIMARY KEY (blob, owner));",
+    _index_without_triggers,
+]
+
+# A detached copy of a note that can be handed to another thread for saving.
+# `base` is the change sequence value the edit started from; when set, a note changed by
+# someone else since then is not overwritten: the edit is saved as a new note and `conflict` set.
+class NoteRecord:
+    def __init__(self, key, id, title, content, images, base=None):
+        self.key = key
+        self.id = id
+        self.title = title
+        self.content = content
+        self.images = list(images)
+        self.base = base
+        self.conflict = False
+        # Keep the state this record replaces in the history even if it was short-lived.
+        self.checkpoint = False
+
+# ---------------------------
+# SQLite Backend (one row per note, deletions as tombstones)
+# ---------------------------
+# Records that `holder` holds the given blobs; see PENDING_BLOB_REFRESH_SECONDS.
+def _hold_blobs(conn, holder, keys):
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO pending_blobs (blob, owner, updated) VALUES (?, ?, ?)",
+            [(key, holder, now) for key in keys],
+        )
+
+# Cursor over ids of notes whose title or content contains the lowercased query, best matches
+# first, from the trigram index alone; the query needs SEARCH_INDEX_MIN_CHARS characters.
+def index_cursor(conn, query):
+    phrase = '"' + query.replace('"', '""') + '"'
+    return conn.execute(
+        "SELECT rowid FROM notes_fts WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts, 10.0, 1.0)", (phrase,)
+    )
+
+# {id: title} of the saved notes among ids, read from the title index without touching bodies.
+def read_titles(conn, ids):
+    titles = {}
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        titles.update(conn.execute(
+            f"SELECT id, title FROM notes WHERE deleted = 0 AND id IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    return titles
+
+class SqliteBackend:
+    def __init__(self, path, blobs, compression=COMPRESSION):
+        self.path = path
+        self.blobs = blobs
+        self.compression = compression
+        self.zdict = None
+        self.conn = self._connect()
+        self._owner = threading.get_ident()
+        self.holder = os.urandom(8).hex()
+        self._upgrade()
+        self.zdict = self._read_dictionary()
+        self.has_search_index = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'"
+        ).fetchone() is not None
+        self._connections = threading.local()
+        self._maintenance = None
+        self._pruned = 0
+        self._collected = 0
+        self._reindex = False
+        self.refresh_search_index()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Every commit is flushed to disk before save() returns.
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.create_function("xyn_contains", 2, lambda text, query: _contains(self.unpack(text), query),
+                             deterministic=True)
+        conn.create_function("xyn_text", 1, self.unpack, deterministic=True)
+        return conn
+
+    def pack(self, text):
+        return pack_text(text, self.compression, self.zdict)
+
+    def unpack(self, value):
+        if self.zdict is None and isinstance(value, bytes) and value[:1] == bytes([_ZLIB_DICT]):
+            self.zdict = self._read_dictionary()
+        return unpack_text(value, self.zdict)
+
+    # Another instance may have learned the dictionary after this one was opened. It never changes
+    # once stored. Read on a connection of its own, since this may run inside an SQL function.
+    def _read_dictionary(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'zdict'").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row is not None else None
+
+    # The connection for the calling thread; worker threads get their own.
+    def connection(self):
+        if threading.get_ident() == self._owner:
+            return self.conn
+        conn = getattr(self._connections, "conn", None)
+        if conn is None:
+            conn = self._connections.conn = self._connect()
+        return conn
+
+    def _upgrade(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for i, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            if callable(step):
+                step(self)
+            else:
+                self.conn.executescript(step)
+            self.conn.execute(f"PRAGMA user_version = {i}")
+        self.conn.commit()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM notes LIMIT 1").fetchone() is None
+
+    # Every live note as a dict with id, title, content and images.
+    def load(self):
+        rows = self.conn.execute(
+            "SELECT id, title, content, images FROM notes WHERE deleted = 0 ORDER BY id"
+        )
+        return [
+            {"id": row[0], "title": row[1], "content": self.unpack(row[2]), "images": json.loads(row[3])}
+            for row in rows
+        ]
+
+    # Returns (id, title) pairs for the note list; bodies are read with load_body.
+    def load_index(self):
+        return self._index_cursor().fetchall()
+
+    def iter_index(self, batch_size):
+        cursor = self._index_cursor()
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+    def _index_cursor(self):
+        return self.conn.execute(
+            "SELECT id, title FROM notes INDEXED BY notes_titles WHERE deleted = 0 ORDER BY id"
+        )
+
+    def load_body(self, note_id):
+        row = self.conn.execute("SELECT content, images FROM notes WHERE id = ?", (note_id,)).fetchone()
+        if row is None:
+            return "", []
+        return self.unpack(row[0]), json.loads(row[1])
+
+    # Cursor over ids of saved notes whose title or content contains the lowercased
+    # query, best matches first. Trigrams need at least three characters.
+    def search_cursor(self, query, conn=None):
+        conn = conn or self.conn
+        if self.has_search_index and len(query) >= SEARCH_INDEX_MIN_CHARS:
+            return index_cursor(conn, query)
+        return conn.execute(
+            "SELECT id FROM notes WHERE deleted = 0 AND (xyn_contains(title, ?1) OR xyn_contains(content, ?1))"
+            " ORDER BY NOT xyn_contains(title, ?1), id",
+            (query,),
+        )
+
+    def load_images(self, note_id):
+        row = self.conn.execute("SELECT images FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return [] if row is None else json.loads(row[0])
+
+    # The blob an identical image was stored as before, if it still exists.
+    def blob_for_pixels(self, pixel_hash):
+        row = self.connection().execute(
+            "SELECT blob FROM image_hashes WHERE pixel_hash = ?", (pixel_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.hold_blobs([row[0]])
+        return row[0] if self.blobs.touch(row[0]) else None
+
+    # Stores a pasted image and holds it until a save references it. The hold is written first:
+    # garbage collection decides under the write lock, so it either sees the hold or has
+    # finished before the blob is written.
+    def put_held_blob(self, data):
+        self.hold_blobs([BlobStore.key_for(data)])
+        return self.blobs.put(data)
+
+    def hold_blobs(self, keys):
+        _hold_blobs(self.connection(), self.holder, keys)
+
+    # Renews the holds of this instance; callers do so every PENDING_BLOB_REFRESH_SECONDS.
+    def refresh_held_blobs(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("UPDATE pending_blobs SET updated = ? WHERE owner = ?", (time.time(), self.holder))
+
+    def remember_pixels(self, pixel_hash, key):
+        conn = self.connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO image_hashes (pixel_hash, blob) VALUES (?, ?)", (pixel_hash, key))
+
+    # Persists only the given notes; new notes get their id assigned here. Blobs referenced by
+    # pending_images or held by any instance, or written after `since`, survive garbage collection.
+    # Writes take the database write lock up front, so checking for conflicting changes by
+    # other writers and saving over them cannot interleave with another process.
+    def save(self, changed, deleted, pending_images=(), since=None):
+        now = time.time()
+        since = since or now
+        conn = self.connection()
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            for note in changed:
+                images = json.dumps(note.images)
+                if note.id is not None and self._changed_since(conn, note):
+                    note.conflict = True
+                    note.id = None
+                    note.title = f"{note.title} (conflict)"
+                if note.id is None:
+                    cur = conn.execute(
+                        "INSERT INTO notes (title, content, images) VALUES (?, ?, ?)",
+                        (note.title, self.pack(note.content), images),
+                    )
+                    note.id = cur.lastrowid
+                else:
+                    self._record_revision(conn, note, now)
+                    self._unindex_note(conn, note.id)
+                    cur = conn.execute(
+                        "UPDATE notes SET title = ?, content = ?, images = ?, deleted = 0 WHERE id = ?",
+                        (note.title, self.pack(note.content), images, note.id),
+                    )
+                    # A restored note whose tombstone was already compacted away.
+                    if cur.rowcount == 0:
+                        conn.execute(
+                            "INSERT INTO notes (id, title, content, images) VALUES (?, ?, ?, ?)",
+                            (note.id, note.title, self.pack(note.content), images),
+                        )
+                self._index_note(conn, note.id, note.title, note.content)
+                note.base = conn.execute("SELECT changed FROM notes WHERE id = ?", (note.id,)).fetchone()[0]
+            for note in deleted:
+                if note.id is None:
+                    continue
+                # Edited elsewhere since: keep it, the other version wins.
+                if self._changed_since(conn, note):
+                    note.conflict = True
+                    continue
+                self._record_revision(conn, None, now, note.id)
+                self._unindex_note(conn, note.id)
+                conn.execute(
+                    "UPDATE notes SET deleted = 1, title = '', content = '', images = '[]' WHERE id = ?", (note.id,)
+                )
+            # Saved notes reference their images now; they no longer need holding.
+            conn.executemany(
+                "DELETE FROM pending_blobs WHERE owner = ? AND blob = ?",
+                [(self.holder, key) for key in {key for note in changed for key in note.images}],
+            )
+            conn.execute("UPDATE pending_blobs SET updated = ? WHERE owner = ?", (now, self.holder))
+        compact = self.tombstone_count() >= COMPACT_THRESHOLD
+        self.run_maintenance(set(pending_images), since, compact)
+
+    def _index_note(self, conn, note_id, title, content):
+        if self.has_search_index:
+            conn.execute("INSERT INTO notes_fts (rowid, title, content) VALUES (?, ?, ?)", (note_id, title, content))
+            conn.execute("UPDATE notes SET indexed = changed WHERE id = ?", (note_id,))
+
+    # Takes a live note out of the index before it is rewritten. Removing it needs the exact text
+    # it was indexed with; if someone else wrote it since, that is unknown and the index is rebuilt.
+    def _unindex_note(self, conn, note_id):
+        if not self.has_search_index:
+            return
+        row = conn.execute(
+            "SELECT title, content, changed, indexed FROM notes WHERE id = ? AND deleted = 0", (note_id,)
+        ).fetchone()
+        if row is None:
+            return
+        if row[2] != row[3]:
+            self._reindex = True
+            return
+        conn.execute(
+            "INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', ?, ?, ?)",
+            (note_id, row[0], self.unpack(row[1])),
+        )
+
+    # Rebuilds the search index if notes were written without it being kept up to date.
+    def refresh_search_index(self, conn=None):
+        conn = conn or self.conn
+        if not self.has_search_index:
+            return
+        stale = conn.execute("SELECT 1 FROM notes WHERE deleted = 0 AND indexed != changed LIMIT 1").fetchone()
+        if stale is None and not self._reindex:
+            return
+        self._reindex = False
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('delete-all')")
+            last = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT id, title, content FROM notes WHERE id > ? AND deleted = 0 ORDER BY id LIMIT 1000", (last,)
+                ).fetchall()
+                if not rows:
+                    break
+                conn.executemany(
+                    "INSERT INTO notes_fts (rowid, title, content) VALUES (?, ?, ?)",
+                    [(note_id, title, self.unpack(content)) for note_id, title, content in rows],
+                )
+                last = rows[-1][0]
+            conn.execute("UPDATE notes SET indexed = changed WHERE deleted = 0 AND indexed != changed")
+
+    def _changed_since(self, conn, note):
+        if note.base is None:
+            return False
+        row = conn.execute("SELECT changed FROM notes WHERE id = ?", (note.id,)).fetchone()
+        # A missing row was deleted elsewhere and compacted away.
+        return row is None or row[0] > note.base
+
+    # The latest change sequence value; every note written later is stamped with a greater one.
+    def change_seq(self, conn=None):
+        conn = conn or self.connection()
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0])
+
+    # (id, title, deleted, changed) of notes written after `seq`, oldest change first. Deletions
+    # are included after compaction removed their tombstones.
+    def changes_since(self, seq, conn=None):
+        conn = conn or self.connection()
+        return conn.execute(
+            "SELECT id, title, deleted, changed FROM notes WHERE changed > ?1"
+            " UNION ALL SELECT id, '', 1, changed FROM deletions WHERE changed > ?1 ORDER BY 4",
+            (seq,),
+        ).fetchall()
+
+    # Keeps the saved state of a note that is about to be overwritten by `note`, or deleted
+    # when `note` is None (the state is then stored in full, as nothing newer will be left).
+    def _record_revision(self, conn, note, now, note_id=None):
+        note_id = note_id if note is None else note.id
+        row = conn.execute(
+            "SELECT title, content, images FROM notes WHERE id = ? AND deleted = 0", (note_id,)
+        ).fetchone()
+        if row is None:
+            return
+        title, content, images = row[0], self.unpack(row[1]), row[2]
+        if note is not None and (title, content, images) == (note.title, note.content, json.dumps(note.images)):
+            return
+        latest = conn.execute(
+            "SELECT id, time, snapshot, data FROM revisions WHERE note_id = ? ORDER BY id DESC LIMIT 1",
+            (note_id,),
+        ).fetchone()
+        short_lived = latest is not None and latest[1] > now - HISTORY_COALESCE_SECONDS
+        if note is not None and not note.checkpoint and short_lived:
+            # The saved state was short-lived: drop it and point the previous revision at the new one.
+            if not latest[2]:
+                older = apply_delta(content, json.loads(self.unpack(latest[3])))
+                conn.execute(
+                    "UPDATE revisions SET data = ? WHERE id = ?",
+                    (self.pack(json.dumps(text_delta(note.content, older))), latest[0]),
+                )
+            return
+        snapshot = note is None or conn.execute(
+            "SELECT COUNT(*) FROM revisions WHERE note_id = ? AND id > "
+            "COALESCE((SELECT MAX(id) FROM revisions WHERE note_id = ? AND snapshot = 1), 0)",
+            (note_id, note_id),
+        ).fetchone()[0] >= HISTORY_SNAPSHOT_EVERY - 1
+        data = content
+        if not snapshot:
+            delta = json.dumps(text_delta(note.content, content))
+            if len(delta) < len(content):
+                data = delta
+            else:
+                snapshot = True
+        conn.execute(
+            "INSERT INTO revisions (note_id, time, title, images, snapshot, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (note_id, now, title, images, int(snapshot), self.pack(data)),
+        )
+
+    # (revision id, time it was saved over, title) for each revision of a note, newest first.
+    def history(self, note_id):
+        return self.connection().execute(
+            "SELECT id, time, title FROM revisions WHERE note_id = ? ORDER BY id DESC", (note_id,)
+        ).fetchall()
+
+    # The note as it was in the given revision, or None if it was pruned.
+    def revision(self, revision_id):
+        conn = self.connection()
+        row = conn.execute("SELECT note_id, title, images FROM revisions WHERE id = ?", (revision_id,)).fetchone()
+        if row is None:
+            return None
+        note_id, title, images = row
+        # Walk back from the nearest full text at or after the revision, or from the note itself.
+        start = conn.execute(
+            "SELECT id, data FROM revisions WHERE note_id = ? AND id >= ? AND snapshot = 1 ORDER BY id LIMIT 1",
+            (note_id, revision_id),
+        ).fetchone()
+        if start is not None:
+            end, content = start[0], self.unpack(start[1])
+        else:
+            head = conn.execute("SELECT content FROM notes WHERE id = ?", (note_id,)).fetchone()
+            end, content = 1 << 62, self.unpack(head[0]) if head is not None else ""
+        if end != revision_id:
+            for (data,) in conn.execute(
+                "SELECT data FROM revisions WHERE note_id = ? AND id >= ? AND id < ? ORDER BY id DESC",
+                (note_id, revision_id, end),
+            ):
+                content = apply_delta(content, json.loads(self.unpack(data)))
+        return NoteRecord(None, note_id, title, content, json.loads(images))
+
+    # Drops revisions older than `days`, except the newest HISTORY_KEEP_REVISIONS of notes
+    # that still exist.
+    def prune_history(self, days=HISTORY_DAYS, conn=None):
+        conn = conn or self.connection()
+        with conn:
+            conn.execute(
+                """
+                DELETE FROM revisions WHERE time < ? AND (
+                    NOT EXISTS (SELECT 1 FROM notes WHERE notes.id = revisions.note_id AND deleted = 0)
+                    OR id NOT IN (
+                        SELECT id FROM revisions AS newer WHERE newer.note_id = revisions.note_id
+                        ORDER BY id DESC LIMIT ?
+                    )
+                )
+                """,
+                (time.time() - days * 86400, HISTORY_KEEP_REVISIONS),
+            )
+
+    def tombstone_count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM notes WHERE deleted = 1").fetchone()[0]
+
+    def compact(self):
+        # Runs on its own connection so it can be called from the maintenance thread.
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO deletions (id, changed) SELECT id, changed FROM notes WHERE deleted = 1"
+                )
+                conn.execute("DELETE FROM notes WHERE deleted = 1")
+            conn.execute("VACUUM")
+            # VACUUM goes through the WAL; fold it back so the space is actually returned.
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+    def referenced_blobs(self, conn=None):
+        conn = conn or self.conn
+        refs = set()
+        for (images,) in conn.execute(
+            "SELECT images FROM notes WHERE images != '[]' UNION SELECT images FROM revisions WHERE images != '[]'"
+        ):
+            refs.update(json.loads(images))
+        return refs
+
+    # Removes blobs that no note, revision or hold refers to and that were written before
+    # `before`. Holding the write lock throughout keeps new holds out until it is done.
+    def collect_garbage(self, pending_images, before):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "DELETE FROM pending_blobs WHERE updated < ?", (time.time() - PENDING_BLOB_EXPIRY_SECONDS,)
+                )
+                held = {key for (key,) in conn.execute("SELECT blob FROM pending_blobs")}
+                self.blobs.collect(self.referenced_blobs(conn) | held | pending_images, before)
+        finally:
+            conn.close()
+
+    def run_maintenance(self, pending_images, before, compact):
+        if self._maintenance is not None and self._maintenance.is_alive():
+            return
+        self._maintenance = threading.Thread(
+            target=self._maintain, args=(pending_images, before, compact), daemon=True
+        )
+        self._maintenance.start()
+
+    # Learns the shared zlib dictionary once the notebook has enough small notes. It is stored
+    # before it is used: records packed against it cannot be read without it, so it never changes.
+    def build_dictionary(self):
+        if self.zdict is not None or self.compression != "zlib":
+            return
+        conn = self._connect()
+        try:
+            texts = [
+                self.unpack(content) for (content,) in conn.execute(
+                    "SELECT content FROM notes WHERE deleted = 0 AND LENGTH(CAST(content AS BLOB)) <= ? "
+                    "ORDER BY id DESC LIMIT 5000", (DICTIONARY_MAX_BYTES,)
+                )
+            ]
+            if len(texts) < DICTIONARY_MIN_NOTES:
+                return
+            zdict = train_dictionary(texts)
+            if not zdict:
+                return
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('zdict', ?)", (zdict,))
+            self.zdict = conn.execute("SELECT value FROM meta WHERE key = 'zdict'").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _maintain(self, pending_images, before, compact):
+        try:
+            if compact:
+                self.compact()
+            if time.time() - self._pruned >= HISTORY_PRUNE_INTERVAL:
+                self._pruned = time.time()
+                conn = self._connect()
+                try:
+                    self.prune_history(conn=conn)
+                finally:
+                    conn.close()
+            if compact or time.time() - self._collected >= COLLECT_INTERVAL:
+                self._collected = time.time()
+                self.collect_garbage(pending_images, before)
+                self.build_dictionary()
+            conn = self._connect()
+            try:
+                self.refresh_search_index(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print("Error maintaining notes store:", e)
+
+    def import_json(self, json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rows = [
+            (item["title"], self.pack(item["content"]), _blob_refs(item.get("images", []), self.put_held_blob))
+            for item in data
+        ]
+        with self.conn:
+            for item, (title, content, images) in zip(data, rows):
+                cur = self.conn.execute(
+                    "INSERT INTO notes (title, content, images) VALUES (?, ?, ?)", (title, content, json.dumps(images))
+                )
+                self._index_note(self.conn, cur.lastrowid, title, item["content"])
+            # Referenced by the notes now; the holds taken while storing them are done.
+            self.conn.executemany(
+                "DELETE FROM pending_blobs WHERE owner = ? AND blob = ?",
+                [(self.holder, key) for key in {key for _, _, images in rows for key in images}],
+            )
+        return len(data)
+
+    def migrate_json(self, json_path):
+        # One-time migration: import the legacy notes.json and keep it as a backup.
+        self.import_json(json_path)
+        os.replace(json_path, json_path + ".bak")
+
+    def close(self):
+        if self._maintenance is not None:
+            self._maintenance.join()
+        # Images still held were never saved; they become garbage.
+        with self.conn:
+            self.conn.execute("DELETE FROM pending_blobs WHERE owner = ?", (self.holder,))
+        self.conn.close()
+
+# ---------------------------
+# Note Store (Qt-free core used by the GUI and the CLI)
+# ---------------------------
+# Characters that are not allowed in file names on at least one platform.
+_UNSAFE_NAME = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+def safe_filename(name):
+    # Trailing dots and spaces are stripped by Windows; reserved device names need a suffix.
+    name = _UNSAFE_NAME.sub("_", name).strip().rstrip(". ")[:150] or "untitled"
+    if name.split(".")[0].upper() in ("CON", "PRN", "AUX", "NUL") or re.fullmatch(r"(COM|LPT)\d", name.upper()):
+        name += "_"
+    return name
+
+def image_extension(data):
+    if data.startswith(b"\x89PNG"):
+        return "png"
+    if data.startswith(b"\xff\xd8"):
+        return "jpg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "bin"
+
+# Runs fn(*args) on pool for each args tuple in items and yields the results in order,
+# keeping at most `window` of them in flight so long inputs are never held in memory.
+def _map_in_order(pool, fn, items, window):
+    pending = collections.deque()
+    items = iter(items)
+    try:
+        while True:
+            while len(pending) < window:
+                args = next(items, None)
+                if args is None:
+                    break
+                pending.append(pool.submit(fn, *args))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+# ---------------------------
+# Bulk Export
+# ---------------------------
+# Notes per worker kept in flight; bounds memory when streaming into an archive.
+EXPORT_WINDOW = 16
+
+def is_archive(target):
+    return target.lower().endswith((".zip", ".tar", ".tar.gz", ".tgz"))
+
+# The files of one note as (name, bytes): the text, then its images as stored, numbered.
+def _export_files(store, item, index, ext, numbered):
+    record = item if isinstance(item, NoteRecord) else store.get(item)
+    if record is None:
+        return []
+    if numbered:
+        stem = safe_filename(f"{record.id if record.id is not None else f'new{index}'} - {record.title}")
+    else:
+        stem = safe_filename(record.title)
+    files = [(f"{stem}.{ext}", record.content.encode("utf-8"))]
+    for i, key in enumerate(record.images, start=1):
+        try:
+            data = store.blobs.get(key)
+        except OSError as e:
+            print("Error exporting image:", e)
+            continue
+        files.append((f"{stem}.{i}.{image_extension(data)}", data))
+    return files
+
+class _DirectoryWriter:
+    # Directory exports write from the worker threads.
+    parallel = True
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, name, data):
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+class _ZipWriter:
+    parallel = False
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, name, data):
+        self.archive.writestr(name, data)
+
+    def close(self):
+        self.archive.close()
+
+class _TarWriter:
+    parallel = False
+
+    def __init__(self, path):
+        # Stream mode: members are appended as they come, nothing is staged on disk.
+        self.archive = tarfile.open(path, "w|gz" if path.lower().endswith(("gz", "tgz")) else "w|")
+        self.mtime = time.time()
+
+    def write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self.mtime
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+
+# Exports notes (store ids, or NoteRecords for notes that are not saved as they are) to a
+# directory, or streams them into a .zip/.tar/.tar.gz archive. Notes are read and, for
+# directories, written by `workers` threads. progress(done, total) is called from the calling
+# thread; returning True from cancelled() stops the export. Returns the number of notes exported.
+def export_notes(store, notes, target, ext, workers=8, progress=None, cancelled=None, numbered=True):
+    if target.lower().endswith(".zip"):
+        writer = _ZipWriter(target)
+    elif is_archive(target):
+        writer = _TarWriter(target)
+    else:
+        writer = _DirectoryWriter(target)
+
+    def work(index, item):
+        files = _export_files(store, item, index, ext, numbered)
+        if writer.parallel:
+            for name, data in files:
+                writer.write(name, data)
+            return []
+        return files
+
+    done = 0
+    workers = max(workers, 1)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            # Results are consumed in order so archives list notes as given.
+            results = _map_in_order(pool, work, enumerate(notes), EXPORT_WINDOW * workers)
+            for files in results:
+                for name, data in files:
+                    writer.write(name, data)
+                done += 1
+                if progress is not None:
+                    progress(done, len(notes))
+                if cancelled is not None and cancelled():
+                    results.close()
+                    break
+    finally:
+        writer.close()
+    return done
+
+# ---------------------------
+# Bulk Import
+# ---------------------------
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")
+# Notes written per save while importing.
+IMPORT_BATCH_SIZE = 1000
+# Files handed to a worker process at a time, and chunks per worker kept in flight.
+IMPORT_CHUNK = 64
+IMPORT_WINDOW = 4
+
+_MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\(<?([^)>\s]+)")
+
+def _read_text(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+# Markdown notes are titled by their first heading, everything else by the file name.
+def _note_title(path, text):
+    if path.lower().endswith((".md", ".markdown")):
+        for line in text.splitlines():
+            if line.startswith("#"):
+                heading = line.lstrip("#").strip()
+                if heading:
+                    return heading
+            elif line.strip():
+                break
+    return os.path.splitext(os.path.basename(path))[0]
+
+# Local images a markdown file links to, as absolute paths.
+def _linked_images(path, text):
+    directory = os.path.dirname(path)
+    for target in _MARKDOWN_IMAGE.findall(text):
+        if "://" in target or target.startswith("data:"):
+            continue
+        image = os.path.normpath(os.path.join(directory, target))
+        if image.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(image):
+            yield image
+
+# Runs in a worker process: reads one note (a text file, or a folder of images when path is
+# None), stores its images as blobs and returns (title, content, blob keys, image paths used).
+# The blobs are held for the importing store (`holder`) before they are written, like a
+# paste, so a garbage collection elsewhere keeps them until their batch is saved.
+def _read_import(blobs, conn, holder, title, path, images):
+    content = ""
+    try:
+        if path is not None:
+            content = _read_text(path)
+            title = _note_title(path, content)
+            images = list(dict.fromkeys(list(images) + list(_linked_images(path, content))))
+        data = []
+        for image in images:
+            with open(image, "rb") as f:
+                data.append(f.read())
+        keys = [BlobStore.key_for(item) for item in data]
+        _hold_blobs(conn, holder, keys)
+        for item in data:
+            blobs.put(item)
+    except (OSError, sqlite3.Error) as e:
+        print("Error importing:", e)
+        return None
+    return title, content, keys, images
+
+def _read_imports(blobs_root, db_path, holder, tasks):
+    blobs = BlobStore(blobs_root)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return [_read_import(blobs, conn, holder, title, path, images) for title, path, images in tasks]
+    finally:
+        conn.close()
+
+# Yields (title, path, images) per note, one directory at a time. Images named after a text
+# file ("note.png", "note.1.png") belong to it; the rest of a directory's images are collected
+# in `loose` and imported as one note per directory at the end.
+def _plan_import(root, loose):
+    if os.path.isfile(root):
+        yield None, os.path.abspath(root), []
+        return
+    for directory, dirs, files in os.walk(os.path.abspath(root)):
+        dirs.sort()
+        files.sort()
+        texts = [name for name in files if name.lower().endswith(TEXT_EXTENSIONS)]
+        stems = {}
+        for name in texts:
+            stems.setdefault(os.path.splitext(name)[0], name)
+        attached = {name: [] for name in texts}
+        unclaimed = []
+        for name in files:
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            stem = os.path.splitext(name)[0]
+            prefix, _, number = stem.rpartition(".")
+            owner = stems.get(stem) or (stems.get(prefix) if number.isdigit() else None)
+            if owner is None:
+                unclaimed.append(os.path.join(directory, name))
+            else:
+                attached[owner].append(os.path.join(directory, name))
+        if unclaimed:
+            loose.append((os.path.basename(directory) or directory, unclaimed))
+        for name in texts:
+            yield None, os.path.join(directory, name), attached[name]
+
+# Imports the text and markdown files under root (or the single file root) into store, reading
+# them and storing their images in `workers` processes. Notes are written in batches of
+# batch_size, each with one save. progress(imported) is called after each batch. Returns the
+# number of notes imported; files that cannot be read are reported and skipped.
+def import_tree(store, root, workers=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    loose = []
+    used = set()
+    imported = 0
+    workers = workers or os.cpu_count() or 4
+
+    def add_all(results):
+        nonlocal imported
+        results = (result for result in results if result is not None)
+        while True:
+            batch = list(itertools.islice(results, batch_size))
+            if not batch:
+                return
+            # Saving releases the holds the workers took on the batch's images.
+            with store.transaction():
+                for title, content, keys, images in batch:
+                    used.update(images)
+                    store.add(title, content, keys)
+            imported += len(batch)
+            if progress is not None:
+                progress(imported)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        def read(tasks):
+            tasks = iter(tasks)
+            chunks = iter(lambda: list(itertools.islice(tasks, IMPORT_CHUNK)), [])
+            args = ((store.blobs.root, store.path, store.holder, chunk) for chunk in chunks)
+            for results in _map_in_order(pool, _read_imports, args, IMPORT_WINDOW * workers):
+                yield from results
+
+        add_all(read(_plan_import(root, loose)))
+        # Folders of images that no text file claimed become notes of their own.
+        folders = []
+        for title, images in loose:
+            images = [image for image in images if image not in used]
+            if images:
+                folders.append((title, None, images))
+        add_all(read(folders))
+    return imported
+
+class NoteStore(SqliteBackend):
+    def __init__(self, path, blobs):
+        super().__init__(path, blobs)
+        self._changed = {}  # id (or the record itself while unsaved) -> NoteRecord
+        self._deleted = {}  # id -> NoteRecord
+        self._depth = 0
+        self._since = None
+
+    # Opens the store at path. An empty store is filled from legacy_json, which is renamed to a
+    # backup once migrated, so a first start that died before it finished migrates again;
+    # a store that did not exist yet is otherwise filled from seed_json.
+    @classmethod
+    def open(cls, path, blobs_dir, legacy_json=None, seed_json=None):
+        is_new = not os.path.exists(path)
+        store = cls(path, BlobStore(blobs_dir))
+        if store.is_empty():
+            if legacy_json and os.path.exists(legacy_json):
+                store.migrate_json(legacy_json)
+            elif is_new and seed_json and os.path.exists(seed_json):
+                store.import_json(seed_json)
+        return store
+
+    @classmethod
+    def open_dir(cls, data_dir, seed_json=None):
+        os.makedirs(data_dir, exist_ok=True)
+        return cls.open(
+            os.path.join(data_dir, "notes.db"), os.path.join(data_dir, "blobs"),
+            legacy_json=os.path.join(data_dir, "notes.json"), seed_json=seed_json,
+        )
+
+    def get(self, note_id):
+        if note_id in self._deleted:
+            return None
+        if note_id in self._changed:
+            return self._changed[note_id]
+        row = self.connection().execute(
+            "SELECT title, content, images FROM notes WHERE id = ? AND deleted = 0", (note_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return NoteRecord(None, note_id, row[0], self.unpack(row[1]), json.loads(row[2]))
+
+    # Ids of matching notes, best first; unlike search_cursor the query may have any case.
+    def find(self, query, limit=None):
+        cursor = self.search_cursor(query.lower(), self.connection())
+        rows = cursor.fetchall() if limit is None else cursor.fetchmany(limit)
+        return [row[0] for row in rows]
+
+    # Mutations are collected and written together when the outermost transaction ends;
+    # outside a transaction each one is written right away. Blobs written after `since`
+    # survive the garbage collection that follows the write.
+    @contextlib.contextmanager
+    def transaction(self, since=None):
+        if self._depth == 0:
+            self._since = since
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._depth == 1:
+                self._changed.clear()
+                self._deleted.clear()
+            raise
+        finally:
+            self._depth -= 1
+        if self._depth == 0:
+            self.commit()
+
+    def commit(self):
+        if not self._changed and not self._deleted:
+            return
+        changed, deleted = list(self._changed.values()), list(self._deleted.values())
+        self._changed.clear()
+        self._deleted.clear()
+        self.save(changed, deleted, since=self._since)
+
+    def _queued(self):
+        if self._depth == 0:
+            self.commit()
+
+    def add(self, title, content, images=()):
+        record = NoteRecord(None, None, title, content, images)
+        self._changed[record] = record
+        self._queued()
+        return record
+
+    def update(self, note_id, title=None, content=None, images=None):
+        record = self.get(note_id)
+        if record is None:
+            raise KeyError(note_id)
+        if title is not None:
+            record.title = title
+        if content is not None:
+            record.content = content
+        if images is not None:
+            record.images = list(images)
+        self._changed[note_id] = record
+        self._queued()
+        return record
+
+    def delete(self, note_id):
+        self._changed.pop(note_id, None)
+        self._deleted[note_id] = NoteRecord(None, note_id, "", "", ())
+        self._queued()
+
+    # Brings a note back to the given revision, undeleting it if needed; the state it replaces
+    # becomes a revision itself.
+    def restore(self, revision_id):
+        record = self.revision(revision_id)
+        if record is None:
+            raise KeyError(revision_id)
+        record.checkpoint = True
+        self._deleted.pop(record.id, None)
+        self._changed[record.id] = record
+        self._queued()
+        return record
+
+    def duplicate(self, note_id):
+        record = self.get(note_id)
+        if record is None:
+            raise KeyError(note_id)
+        return self.add(f"Copy - {record.title}", record.content, record.images)
+
+    def stats(self):
+        conn = self.connection()
+        notes, content_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM notes WHERE deleted = 0"
+        ).fetchone()
+        revisions, revision_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(data AS BLOB))), 0) FROM revisions"
+        ).fetchone()
+        blob_count = blob_bytes = 0
+        for key, _ in self.blobs.keys():
+            blob_count += 1
+            blob_bytes += os.path.getsize(self.blobs.path(key))
+        return {
+            "notes": notes,
+            "tombstones": self.tombstone_count(),
+            "content_bytes": content_bytes,
+            "revisions": revisions,
+            "revision_bytes": revision_bytes,
+            "referenced_images": len(self.referenced_blobs(conn)),
+            "blobs": blob_count,
+            "blob_bytes": blob_bytes,
+            "database_bytes": sum(
+                os.path.getsize(path) for path in (self.path, self.path + "-wal") if os.path.exists(path)
+            ),
+        }
+
+    def close(self):
+        self.commit()
+        super().close()
+
+# ---------------------------
+# Notebooks
+# ---------------------------
+# The notebook kept directly in the data directory, where all notes lived before notebooks.
+DEFAULT_NOTEBOOK = "Notes"
+# Every other notebook is a directory of its own (notes.db and blobs) under this one.
+NOTEBOOKS_DIR = "notebooks"
+# Remembers the open notebook and a few numbers about each notebook for listing them.
+CATALOG_FILE = "notebooks.json"
+
+# The notebooks under a data directory. Only the one in use needs to be open; the others are
+# listed from the catalog and searched one at a time through their own indexes.
+class NotebookCatalog:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, CATALOG_FILE)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.info = data.get("notebooks", {})  # name -> {"notes", "bytes", "modified"}
+        self.active = data.get("active", DEFAULT_NOTEBOOK)
+        if not self.exists(self.active):
+            self.active = DEFAULT_NOTEBOOK
+
+    def directory(self, name):
+        if name == DEFAULT_NOTEBOOK:
+            return self.data_dir
+        return os.path.join(self.data_dir, NOTEBOOKS_DIR, name)
+
+    def exists(self, name):
+        return name == DEFAULT_NOTEBOOK or os.path.exists(os.path.join(self.directory(name), "notes.db"))
+
+    # The default notebook first, then the others by name.
+    def names(self):
+        root = os.path.join(self.data_dir, NOTEBOOKS_DIR)
+        names = []
+        if os.path.isdir(root):
+            names = [entry.name for entry in os.scandir(root) if entry.is_dir() and self.exists(entry.name)]
+        return [DEFAULT_NOTEBOOK] + sorted((name for name in names if name != DEFAULT_NOTEBOOK), key=str.lower)
+
+    def open(self, name, seed_json=None):
+        return NoteStore.open_dir(self.directory(name), seed_json=seed_json)
+
+    # Creates an empty notebook and returns its name, which is made safe for a directory name.
+    def create(self, name):
+        name = safe_filename(name)
+        if self.exists(name):
+            raise ValueError(f"A notebook named '{name}' already exists")
+        self.open(name).close()
+        self.save()
+        return name
+
+    # Caches what listing the notebook shows, so it does not have to be opened for that.
+    def remember(self, name, store):
+        notes = store.connection().execute("SELECT COUNT(*) FROM notes WHERE deleted = 0").fetchone()[0]
+        self.info[name] = {
+            "notes": notes,
+            "bytes": os.path.getsize(store.path),
+            "modified": time.time(),
+        }
+        self.save()
+
+    def set_active(self, name):
+        self.active = name
+        self.save()
+
+    def save(self):
+        data = {"active": self.active, "notebooks": {
+            name: info for name, info in self.info.items() if self.exists(name)
+        }}
+        atomic_write(self.path, json.dumps(data, indent=2).encode("utf-8"))
+
+    # A read-only connection to the search index of a notebook, or None if it has no database
+    # or no index yet. Unlike open() this never creates, migrates or imports anything.
+    def open_index(self, name):
+        path = os.path.join(self.directory(name), "notes.db")
+        if not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro", uri=True, timeout=30)
+        try:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone() is not None:
+                return conn
+        except sqlite3.DatabaseError:
+            pass
+        conn.close()
+        return None
+
+    # Yields (notebook, note id, title) for notes containing query in each named notebook, best
+    # matches first within a notebook and at most `limit` per notebook. Only the search index
+    # and titles are read, one notebook at a time; queries too short for the index and notebooks
+    # without one yield nothing rather than scanning every note.
+    def search(self, query, names=None, limit=None, cancelled=None):
+        query = query.lower()
+        if len(query) < SEARCH_INDEX_MIN_CHARS:
+            return
+        for name in self.names() if names is None else names:
+            if cancelled is not None and cancelled.is_set():
+                return
+            conn = self.open_index(name)
+            if conn is None:
+                continue
+            try:
+                if cancelled is not None:
+                    conn.set_progress_handler(cancelled.is_set, 1000)
+                try:
+                    cursor = index_cursor(conn, query)
+                    ids = [row[0] for row in (cursor.fetchall() if limit is None else cursor.fetchmany(limit))]
+                    titles = read_titles(conn, ids)
+                except sqlite3.OperationalError:
+                    if cancelled is not None and cancelled.is_set():
+                        return
+                    raise
+            finally:
+                conn.close()
+            for note_id in ids:
+                if note_id in titles:
+                    yield name, note_id, titles[note_id]
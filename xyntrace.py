@@ -0,0 +1,169 @@
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds of the latency buckets in milliseconds; slower calls land in the last bucket.
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# How many of the most recent event loop stalls are kept with their details.
+STALL_HISTORY = 100
+
+# ---------------------------
+# Latency Histograms
+# ---------------------------
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        index = 0
+        while index < len(BUCKETS_MS) and ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    # Upper bucket bound below which the given fraction of the calls finished.
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + [None], self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return self.max_ms if bound is None else min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets_ms": BUCKETS_MS + ["inf"],
+            "counts": list(self.counts),
+        }
+
+# ---------------------------
+# Tracer
+# ---------------------------
+# Collects per-operation histograms from any thread. Off unless XYNNOTES_TRACE is set or
+# enable() is called; disabled tracing costs one attribute check per traced call.
+# XYNNOTES_TRACE_PROFILE names an operation whose calls are additionally run under cProfile.
+class Tracer:
+    def __init__(self):
+        self.enabled = os.environ.get("XYNNOTES_TRACE", "") not in ("", "0")
+        self.profile_operation = os.environ.get("XYNNOTES_TRACE_PROFILE") or None
+        self.histograms = {}
+        self.stalls = []
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._profiling = False
+        self._current = threading.local()
+
+    def enable(self, profile_operation=None):
+        self.enabled = True
+        if profile_operation:
+            self.profile_operation = profile_operation
+
+    def record(self, name, ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(ms)
+
+    # Remembers when a startup phase was first reached, in ms since this module was imported.
+    def mark(self, phase):
+        if phase not in self.phases:
+            self.phases[phase] = (time.perf_counter() - self.origin) * 1000
+
+    def record_stall(self, ms, operation):
+        self.record("event_loop_stall", ms)
+        with self._lock:
+            self.stalls.append({"time": time.time(), "ms": ms, "after": operation})
+            del self.stalls[:-STALL_HISTORY]
+
+    def call(self, name, fn, *args, **kwargs):
+        profiler = self._start_profile(name)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+            self._current.last = name
+            if profiler is not None:
+                self._stop_profile(profiler)
+
+    # The last traced operation that finished on the calling thread.
+    def last_operation(self):
+        return getattr(self._current, "last", None)
+
+    def _start_profile(self, name):
+        if name != self.profile_operation:
+            return None
+        with self._lock:
+            # cProfile follows one thread; concurrent and nested calls go unprofiled.
+            if self._profiling:
+                return None
+            self._profiling = True
+            if self._profiler is None:
+                import cProfile
+                self._profiler = cProfile.Profile()
+            profiler = self._profiler
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, profiler):
+        profiler.disable()
+        with self._lock:
+            self._profiling = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "time": time.time(),
+                "startup_ms": dict(self.phases),
+                "operations": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "stalls": list(self.stalls),
+            }
+
+    # Writes the histograms, and the cProfile stats if any were captured, into directory.
+    # Returns the path of the JSON file.
+    def dump(self, directory):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory, f"trace-{stamp}.json")
+        data = self.snapshot()
+        with self._lock:
+            profiler = None if self._profiling else self._profiler
+        if profiler is not None:
+            profile_path = os.path.join(directory, f"trace-{stamp}-{self.profile_operation}.prof")
+            profiler.dump_stats(profile_path)
+            data["profile"] = profile_path
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return path
+
+tracer = Tracer()
+
+# Records how long each call of the decorated function takes under the given operation name.
+def traced(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            return tracer.call(name, fn, *args, **kwargs)
+        return wrapper
+    return decorate